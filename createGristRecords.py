@@ -1,7 +1,11 @@
 import os
+import sys
+import functools
 import json
+import orjson
 from datetime import datetime, timedelta
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from logging.handlers import RotatingFileHandler
 from typing import List, Dict, Any, Optional
 import csv
@@ -37,6 +41,53 @@ console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(
 console_handler.setLevel(logging.DEBUG) # Ensure console handler also logs DEBUG
 logger.addHandler(console_handler)
 
+# Strips currency symbols, separators and whitespace from amount strings in
+# a single C-level pass (vs one pass per chained .replace())
+_AMOUNT_STRIP = str.maketrans('', '', '$,₹ \t\n')
+
+@functools.lru_cache(maxsize=4096)
+def _parse_date_string_cached(cleaned_date_string: str, bank_upper: Optional[str]) -> Optional[datetime]:
+    """
+    Run the strptime format cascade for a cleaned date string.
+
+    Cached because the same date strings repeat across many rows of a bank
+    file; the cache key is (cleaned string, uppercased bank name). Must stay
+    free of per-call side effects so cached results match fresh parses.
+    """
+    # Normalize AM/PM case
+    if 'am' in cleaned_date_string:
+        cleaned_date_string = cleaned_date_string.replace('am', 'AM')
+    if 'pm' in cleaned_date_string:
+        cleaned_date_string = cleaned_date_string.replace('pm', 'PM')
+
+    # Define date format patterns
+    mm_dd_yyyy_formats = [
+        '%m-%d-%Y %I:%M:%S %p', '%m-%d-%Y %H:%M:%S', '%m-%d-%Y',
+        '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %I:%M:%S %p', '%m/%d/%Y'
+    ]
+    dd_mm_yyyy_formats = [
+        '%d-%m-%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S',
+        '%d-%m-%Y %I:%M:%S %p', '%d-%m-%Y %I:%M %p',
+        '%d-%m-%Y', '%d/%m/%Y'
+    ]
+    yyyy_formats = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d']
+
+    # Choose format priority based on bank
+    if bank_upper == 'ICICI':
+        # For ICICI, prioritize MM/DD/YYYY formats
+        format_priority = mm_dd_yyyy_formats + dd_mm_yyyy_formats
+    else:
+        # For non-ICICI, prioritize DD/MM/YYYY formats
+        format_priority = dd_mm_yyyy_formats + mm_dd_yyyy_formats
+
+    for fmt in format_priority + yyyy_formats:
+        try:
+            return datetime.strptime(cleaned_date_string, fmt)
+        except ValueError:
+            continue
+
+    return None
+
 class GristRecordCreator:
     def __init__(self):
         """
@@ -94,12 +145,18 @@ class GristRecordCreator:
         """Read records from a text file"""
         records = []
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        records.append(json.loads(line.strip()))
-                    except json.JSONDecodeError as e:
-                        logger.error(f"Error decoding JSON from line: {line.strip()} - {e}")
+            # Read the whole file in one binary read and split on newlines
+            # once instead of iterating Python line objects, with orjson
+            # decoding the raw bytes directly (~3-5x faster than stdlib json)
+            with open(file_path, 'rb') as f:
+                data = f.read()
+            for line in data.split(b'\n'):
+                if not line.strip():
+                    continue
+                try:
+                    records.append(orjson.loads(line))
+                except orjson.JSONDecodeError as e:
+                    logger.error(f"Error decoding JSON from line: {line.decode('utf-8', 'replace').strip()} - {e}")
             logger.info(f"Successfully read {len(records)} records from {file_path}")
         except FileNotFoundError:
             logger.error(f"File not found: {file_path}")
@@ -134,59 +191,17 @@ class GristRecordCreator:
         if cleaned_date_string.isdigit():
             return self._parse_unix_timestamp(cleaned_date_string)
 
-        # If not a digit string, proceed with string date parsing
+        # If not a digit string, proceed with string date parsing. The
+        # cascade itself is memoized at module level, so repeated date
+        # strings only pay the strptime trials once per run.
         logger.debug(f"Attempting string date parsing for: {cleaned_date_string}")
 
-        # Normalize AM/PM case
-        if 'am' in cleaned_date_string.lower():
-            cleaned_date_string = cleaned_date_string.replace('am', 'AM').replace('AM', 'AM')
-        if 'pm' in cleaned_date_string.lower():
-            cleaned_date_string = cleaned_date_string.replace('pm', 'PM').replace('PM', 'PM')
-
-        # Define date format patterns
-        mm_dd_yyyy_formats = [
-            '%m-%d-%Y %I:%M:%S %p', '%m-%d-%Y %H:%M:%S', '%m-%d-%Y',
-            '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %I:%M:%S %p', '%m/%d/%Y'
-        ]
-        dd_mm_yyyy_formats = [
-            '%d-%m-%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S', 
-            '%d-%m-%Y %I:%M:%S %p', '%d-%m-%Y %I:%M %p',
-            '%d-%m-%Y', '%d/%m/%Y'
-        ]
-        yyyy_formats = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d']
-
-        parsed_dt = None
-
-        # Choose format priority based on bank
-        if bank_name and bank_name.upper() == 'ICICI':
-            # For ICICI, prioritize MM/DD/YYYY formats
-            format_priority = mm_dd_yyyy_formats + dd_mm_yyyy_formats
-        else:
-            # For non-ICICI, prioritize DD/MM/YYYY formats
-            format_priority = dd_mm_yyyy_formats + mm_dd_yyyy_formats
-
-        # Try the prioritized formats first
-        for fmt in format_priority:
-            try:
-                parsed_dt = datetime.strptime(cleaned_date_string, fmt)
-                logger.debug(f"Successfully parsed '{cleaned_date_string}' using format '{fmt}'")
-                break
-            except ValueError:
-                continue
-
-        # Try YYYY formats as last resort
-        if not parsed_dt:
-            for fmt in yyyy_formats:
-                try:
-                    parsed_dt = datetime.strptime(cleaned_date_string, fmt)
-                    logger.debug(f"Successfully parsed '{cleaned_date_string}' using format '{fmt}'")
-                    break
-                except ValueError:
-                    continue
+        bank_upper = bank_name.upper() if bank_name else None
+        parsed_dt = _parse_date_string_cached(cleaned_date_string, bank_upper)
 
         if not parsed_dt:
             logger.warning(f"Could not parse date string: {date_string}")
-        
+
         return parsed_dt
     
     def normalize_date(self, date_value: Any, bank_name: Optional[str] = None) -> Optional[datetime]:
@@ -223,14 +238,17 @@ class GristRecordCreator:
             return None
         
         try:
-            if isinstance(amount_value, str):
-                amount_str = amount_value.replace('$', '').replace(',', '').replace('₹', '').strip()
-                if not amount_str:
-                    return None
-                return float(amount_str)
-            
-            return float(amount_value)
-            
+            # JSON-decoded amounts are often already numeric - skip the
+            # string cleanup entirely for those
+            if isinstance(amount_value, (int, float)):
+                return float(amount_value)
+
+            # Remove currency symbols, commas and whitespace in one pass
+            amount_str = str(amount_value).translate(_AMOUNT_STRIP)
+            if not amount_str:
+                return None
+            return float(amount_str)
+
         except Exception as e:
             logger.warning(f"Failed to normalize amount {amount_value}: {e}")
             return None
@@ -339,13 +357,18 @@ class GristRecordCreator:
         except Exception as e:
             logger.error(f"Failed to archive file {file_path}: {e}")
 
-    def create_grist_records_from_file(self):
+    def create_grist_records_from_file(self, file_path: Optional[str] = None):
         """
         Read records from the daily TXT file, identify new transactions based on Row_Num field,
         and save them to a CSV file in ./UploadGrist with GSheets_RowNum field added.
+
+        The caller may pass the data file path explicitly (the wrapper
+        script already knows it); recomputing it from the clock here could
+        disagree across a midnight boundary.
         """
-        file_name = self._get_current_date_filename()
-        file_path = os.path.join(self.data_dir, file_name)
+        if file_path is None:
+            file_name = self._get_current_date_filename()
+            file_path = os.path.join(self.data_dir, file_name)
 
         if not os.path.exists(file_path):
             logger.error(f"Data file not found: {file_path}")
@@ -354,11 +377,16 @@ class GristRecordCreator:
         try:
             logger.info(f"Starting record processing from file: {file_path}")
 
-            # Get latest row number from Grist
-            latest_grist_row_num = self.get_latest_row_number_from_grist()
-            
-            # Read records from file
-            file_records = self.read_records_from_file(file_path)
+            # The Grist lookup is network-bound and the file read is local
+            # I/O, so run them concurrently instead of back to back
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                row_num_future = executor.submit(self.get_latest_row_number_from_grist)
+
+                # Read records from file
+                file_records = self.read_records_from_file(file_path)
+
+                # Get latest row number from Grist
+                latest_grist_row_num = row_num_future.result()
             if not file_records:
                 logger.info("No records found in the data file")
                 self.archive_file(file_path)
@@ -390,25 +418,42 @@ class GristRecordCreator:
                     all_keys.add('GSheets_RowNum')
                     fieldnames = sorted(list(all_keys))
 
+                    # One reusable list buffer instead of a fresh dict per
+                    # row: each record only writes the cells it has and
+                    # resets them afterwards, halving the per-row hashing
+                    key_idx = {key: i for i, key in enumerate(fieldnames)}
+                    row_buffer = [''] * len(fieldnames)
+                    gsheets_idx = key_idx['GSheets_RowNum']
+                    date_idx = key_idx.get('Transaction Date')
+
                     with open(output_csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-                        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                        writer.writeheader()
-                        
+                        writer = csv.writer(csvfile)
+                        writer.writerow(fieldnames)
+
                         for record in records_to_output:
-                            row_to_write = {key: record.get(key, '') for key in fieldnames}
-                            
+                            touched = []
+                            for key, value in record.items():
+                                idx = key_idx.get(key)
+                                if idx is None: # Row_Num is not a CSV column
+                                    continue
+                                row_buffer[idx] = value
+                                touched.append(idx)
+
                             # Add GSheets_RowNum field (using value from Row_Num)
-                            row_to_write['GSheets_RowNum'] = record.get('Row_Num', '')
-                            
+                            row_buffer[gsheets_idx] = record.get('Row_Num', '')
+                            touched.append(gsheets_idx)
+
                             # Format Transaction Date for output
-                            if 'Transaction Date' in row_to_write:
+                            if date_idx is not None:
                                 original_date = record.get('Transaction Date')
                                 if original_date:
                                     dt_obj = self.normalize_date(original_date, record.get('Bank'))
                                     if dt_obj:
-                                        row_to_write['Transaction Date'] = self._format_datetime_for_output(dt_obj)
+                                        row_buffer[date_idx] = self._format_datetime_for_output(dt_obj)
 
-                            writer.writerow(row_to_write)
+                            writer.writerow(row_buffer)
+                            for idx in touched:
+                                row_buffer[idx] = ''
                     
                     logger.info(f"Successfully wrote {len(records_to_output)} records to {output_csv_path}")
                     
@@ -425,11 +470,11 @@ class GristRecordCreator:
             logger.error(f"Error in create_grist_records_from_file: {e}")
             raise
 
-def main():
+def main(file_path: Optional[str] = None):
     """Main function to run the Grist record creation script"""
     try:
         creator = GristRecordCreator()
-        creator.create_grist_records_from_file()
+        creator.create_grist_records_from_file(file_path)
         logger.info("Script completed successfully")
         return 0
     except Exception as e:
@@ -437,4 +482,4 @@ def main():
         return 1
 
 if __name__ == "__main__":
-    exit(main())
\ No newline at end of file
+    exit(main(sys.argv[1] if len(sys.argv) > 1 else None))
\ No newline at end of file
@@ -1,10 +1,19 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
 from datetime import datetime, timedelta
+import functools
+import hashlib
+from collections import Counter, defaultdict, namedtuple
+import mmap
+import re
+import sys
 import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from logging.handlers import RotatingFileHandler
-from typing import List, Dict, Any, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 import os
 import csv # Added import for CSV handling
 from dotenv import load_dotenv
@@ -36,7 +45,250 @@ console_handler = logging.StreamHandler()
 console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 logger.addHandler(console_handler)
 
+# Matches an ISO-style YYYY-MM-DD prefix, which can skip the day/month
+# format trials entirely
+_ISO_PREFIX_RE = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+# Exact shapes of _YYYY_FORMATS; fromisoformat also accepts T separators,
+# times without seconds etc., which the strptime cascade would reject
+_ISO_SHAPE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}(?: \d{2}:\d{2}:\d{2})?$')
+
+# Captures all date shapes the strptime cascade accepts in one pass so the
+# common case can be built with a direct datetime() call; strptime re-parses
+# its format string on every attempt and is an order of magnitude slower
+_DATE_RE = re.compile(
+    r'^(\d{1,4})([-/])(\d{1,2})\2(\d{1,4})'
+    r'(?: (\d{1,2}):(\d{2})(?::(\d{2}))?( ?)([AP]M)?)?$'
+)
+
+# Strips currency symbols, separators and whitespace from amount strings in
+# a single C-level pass (vs one pass per chained .replace())
+_AMOUNT_STRIP = str.maketrans('', '', '$,₹ \t\n')
+
+# Lightweight view of a fetched Grist record: the three compared fields as
+# tuple slots (C-level index access in the hot loops) plus the full
+# fields dict for callers that need the complete record
+GristRec = namedtuple('GristRec', 'date desc amount raw')
+
+# The strptime cascade's format tables are constants - built once here as
+# tuples instead of fresh lists on every parse call
+_MM_DD_FORMATS = (
+    '%m-%d-%Y %I:%M:%S %p', '%m-%d-%Y %H:%M:%S', '%m-%d-%Y',
+    '%m/%d/%Y %H:%M:%S', '%m/%d/%Y'
+)
+_DD_MM_FORMATS = (
+    '%d-%m-%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M:%S',
+    '%d-%m-%Y %I:%M:%S %p',
+    '%d-%m-%Y %I:%M%p',
+    '%d-%m-%Y',
+    '%d/%m/%y', # Added for DD/MM/YY format like 11/7/25
+)
+_YYYY_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+
+# Bank-specific priority orders, precombined so parsing does no list
+# concatenation per call
+_ICICI_PRIORITY = _MM_DD_FORMATS + _DD_MM_FORMATS
+_DEFAULT_PRIORITY = ('%d/%m/%Y %H:%M:%S',) + _DD_MM_FORMATS + _MM_DD_FORMATS
+
+# Family of each format. Formats in different families can both match the
+# same ambiguous string, so hit-count promotion must never reorder across
+# them; within a family the shapes are mutually exclusive
+_FMT_FAMILY = {}
+for _fmt in _MM_DD_FORMATS:
+    _FMT_FAMILY[_fmt] = 'md'
+for _fmt in _DD_MM_FORMATS:
+    _FMT_FAMILY[_fmt] = 'dm'
+for _fmt in _YYYY_FORMATS:
+    _FMT_FAMILY[_fmt] = 'y'
+del _fmt
+
+# Per-bank success counts for strptime formats. After a short warmup the
+# format that matches a bank's export style sorts first, so the first
+# attempt succeeds for nearly every distinct date string
+_FMT_HITS: Dict[Optional[str], Counter] = defaultdict(Counter)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_date_string_cached(cleaned_date_string: str, bank_upper: Optional[str]) -> Optional[datetime]:
+    """
+    Run the strptime format cascade for a cleaned date string.
+
+    Cached because bank files repeat the same handful of date strings many
+    times per run; the cache key is (cleaned string, uppercased bank name).
+    Must stay free of per-call side effects so cached results are equivalent
+    to fresh parses.
+    """
+    if 'am' in cleaned_date_string:
+        cleaned_date_string = cleaned_date_string.replace('am', 'AM')
+    if 'pm' in cleaned_date_string:
+        cleaned_date_string = cleaned_date_string.replace('pm', 'PM')
+
+    # Bind the hot callable locally: every strptime attempt below then costs
+    # a fast local load instead of two attribute lookups
+    strptime = datetime.strptime
+
+    # ISO-style strings never match the day/month formats, so route them
+    # straight to fromisoformat (C-level, far faster than strptime)
+    if _ISO_PREFIX_RE.match(cleaned_date_string):
+        # Only trust fromisoformat for shapes the cascade itself accepts
+        if _ISO_SHAPE_RE.match(cleaned_date_string):
+            try:
+                return datetime.fromisoformat(cleaned_date_string)
+            except ValueError:
+                pass
+        for fmt in _YYYY_FORMATS:
+            try:
+                return strptime(cleaned_date_string, fmt)
+            except ValueError:
+                continue
+        return None
+
+    # Fast path: decompose the string with one regex match and build the
+    # datetime directly, but only when the result provably matches what
+    # the strptime cascade below would return: the day/month assignment
+    # must be unambiguous (one field > 12, 4-digit year) and the string's
+    # shape must correspond to a format the cascade actually contains for
+    # that assignment. Everything else - both fields <= 12, 2-digit years,
+    # shapes with no matching format - falls through, so the bank-specific
+    # priority order below stays the single source of truth for how
+    # ambiguous strings resolve.
+    m = _DATE_RE.match(cleaned_date_string)
+    if m:
+        a, sep, b, c, hh, mins, ss, pad, meridiem = m.groups()
+        shape_ok = False
+        year = month = day = 0
+        if meridiem is None and pad:
+            pass  # trailing blank: no cascade format accepts one
+        elif len(a) == 4:
+            # Year-first only exists as %Y-%m-%d [%H:%M:%S]
+            if sep == '-' and meridiem is None and (hh is None or ss is not None):
+                year, month, day = int(a), int(b), int(c)
+                shape_ok = True
+        elif len(c) == 4:
+            ai, bi = int(a), int(b)
+            year = int(c)
+            if ai > 12 >= bi:
+                day, month = ai, bi
+                if sep == '-':
+                    # %d-%m-%Y, %d-%m-%Y %H:%M:%S, %d-%m-%Y %I:%M:%S %p,
+                    # %d-%m-%Y %I:%M%p (no blank before the marker)
+                    if hh is None:
+                        shape_ok = True
+                    elif meridiem is None:
+                        shape_ok = ss is not None
+                    elif ss is not None:
+                        shape_ok = bool(pad)
+                    else:
+                        shape_ok = not pad
+                else:
+                    # Day-first with '/' exists only as %d/%m/%Y %H:%M:%S
+                    shape_ok = ss is not None and meridiem is None
+            elif bi > 12 >= ai:
+                month, day = ai, bi
+                if sep == '-':
+                    # %m-%d-%Y, %m-%d-%Y %H:%M:%S, %m-%d-%Y %I:%M:%S %p
+                    shape_ok = hh is None or (
+                        ss is not None and (meridiem is None or bool(pad))
+                    )
+                else:
+                    # %m/%d/%Y, %m/%d/%Y %H:%M:%S
+                    shape_ok = meridiem is None and (hh is None or ss is not None)
+        if shape_ok:
+            try:
+                hour = int(hh) if hh else 0
+                minute = int(mins) if mins else 0
+                second = int(ss) if ss else 0
+                if meridiem is not None:
+                    if not 1 <= hour <= 12:
+                        raise ValueError(hour)  # %I only accepts 1-12
+                    if meridiem == 'PM' and hour != 12:
+                        hour += 12
+                    elif meridiem == 'AM' and hour == 12:
+                        hour = 0
+                return datetime(year, month, day, hour, minute, second)
+            except ValueError:
+                # Out-of-range fields fail in the cascade too
+                pass
+
+    if bank_upper == 'ICICI':
+        # ICICI exports MM-DD-YYYY first, DD-MM-YYYY as fallback
+        format_priority = _ICICI_PRIORITY
+    else:
+        # Prioritize the specific format 'DD/MM/YYYY HH:MM:SS' for non-ICICI banks
+        format_priority = _DEFAULT_PRIORITY
+
+    # Discriminate on cheap string features before paying for strptime's
+    # raised-and-caught ValueError per miss: the separator must appear in
+    # the format, and %p formats only apply when an AM/PM marker is present
+    has_meridiem = 'AM' in cleaned_date_string or 'PM' in cleaned_date_string
+    if '/' in cleaned_date_string:
+        candidates = [f for f in format_priority if '/' in f and ('%p' in f) == has_meridiem]
+    elif '-' in cleaned_date_string:
+        candidates = [f for f in format_priority if '-' in f and ('%p' in f) == has_meridiem]
+    else:
+        candidates = format_priority
+
+    # Promote often-matching formats, but only within their own day/month
+    # family: the family blocks keep their cascade order, so the promotion
+    # can never change which family wins an ambiguous parse. sorted() is
+    # stable, so untried formats also keep their priority order inside
+    # each family.
+    hits = _FMT_HITS[bank_upper]
+    if hits:
+        block_rank: Dict[str, int] = {}
+        for idx, fmt in enumerate(candidates):
+            block_rank.setdefault(_FMT_FAMILY[fmt], idx)
+        candidates = sorted(
+            candidates, key=lambda f: (block_rank[_FMT_FAMILY[f]], -hits[f])
+        )
+
+    for fmt in candidates:
+        try:
+            parsed = strptime(cleaned_date_string, fmt)
+            hits[fmt] += 1
+            return parsed
+        except ValueError:
+            continue
+
+    # Fall back to the full cascade if the discriminator pruned too hard
+    for fmt in format_priority + _YYYY_FORMATS:
+        if fmt in candidates:
+            continue
+        try:
+            parsed = strptime(cleaned_date_string, fmt)
+            hits[fmt] += 1
+            return parsed
+        except ValueError:
+            continue
+
+    return None
+
+
 class GristBankUpdater:
+    # Fixed attribute layout: skips the per-instance __dict__ and makes the
+    # many attribute reads in the per-record loops a little cheaper
+    __slots__ = (
+        'grist_api_key', 'grist_doc_id', 'grist_table_name', 'grist_base_host',
+        'data_dir', 'archive_dir', 'grist_base_url', 'records_url',
+        'columns_url', 'grist_headers', 'session', 'bulk_batch_size',
+        'structure_cache_path', 'structure_cache_ttl', '_recent_cache',
+        '_last_dt_cache',
+        'dedup_cache_path', '_seen_key_digests', '_ts_warn_count',
+    )
+
+    # Maximum "timestamp-shaped date" warnings emitted per run
+    _TS_WARN_CAP = 5
+
+    # Mapping from Google Sheets field names to Grist field names
+    GOOGLE_TO_GRIST_MAP = {
+        'Transaction Date': 'Transaction_Date',
+        'Transaction Description': 'Transaction_Description',
+        'Transaction Amount': 'Transaction_Amount',
+        'Reference No.': 'Reference_No',
+        'Value Date': 'Value_Date'
+    }
+
     def __init__(self):
         """
         Initialize the updater with Grist configurations from environment variables
@@ -68,6 +320,10 @@ class GristBankUpdater:
         # Grist API base URL (for self-hosted Grist)
         self.grist_base_url = f"{self.grist_base_host}/api/docs/{self.grist_doc_id}/tables/{self.grist_table_name}"
         
+        # Endpoint URLs used on every call - build them once
+        self.records_url = f"{self.grist_base_url}/records"
+        self.columns_url = f"{self.grist_base_host}/api/docs/{self.grist_doc_id}/tables/{self.grist_table_name}/columns"
+
         logger.info(f"Using Grist server: {self.grist_base_host}")
         logger.info(f"Grist API URL: {self.grist_base_url}")
 
@@ -77,37 +333,125 @@ class GristBankUpdater:
             "Content-Type": "application/json"
         }
 
+        # Persistent session: keep-alive avoids a new TCP handshake per call,
+        # and the retry policy covers transient Grist/server errors
+        self.session = requests.Session()
+        self.session.headers.update(self.grist_headers)
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 502, 503, 504])
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # Maximum records per bulk insert POST
+        self.bulk_batch_size = int(os.getenv('GRIST_BATCH_SIZE', 500))
+
+        # On-disk copy of the table structure plus its ETag, so repeat runs
+        # can revalidate with a conditional GET instead of re-downloading
+        self.structure_cache_path = os.path.join(self.data_dir, '.grist_structure.json')
+        self.structure_cache_ttl = int(os.getenv('GRIST_STRUCTURE_CACHE_TTL', 0))
+
+        # (fetched_at, limit, records) from the last recent-records query
+        self._recent_cache: Optional[Tuple[float, int, List[Dict[str, Any]]]] = None
+        # (raw_last_datetime, parsed) - keyed on the raw string so a fresh
+        # batch with a new boundary datetime invalidates it automatically
+        self._last_dt_cache: Optional[Tuple[Optional[str], Optional[datetime]]] = None
+
+        # On-disk digest set of every transaction key this updater has ever
+        # written, so duplicates older than the recent-records window from
+        # Grist are still caught without paginating history over HTTP
+        self.dedup_cache_path = os.getenv(
+            'DEDUP_CACHE_FILE', os.path.join(self.data_dir, '.dedup_keys.json')
+        )
+        self._seen_key_digests = self._load_seen_digests()
+        self._ts_warn_count = 0
+
     def _get_current_date_filename(self) -> str:
         """Generate filename based on current date in ddmmyy.txt format"""
         return datetime.now().strftime("%d%m%y") + ".txt"
 
-    def read_records_from_file(self, file_path: str) -> List[Dict[str, Any]]:
-        """Read records from a text file"""
-        records = []
+    def iter_records_from_file(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """
+        Yield decoded records from a text file one at a time.
+
+        Streams lines straight off a memory map served from the page cache,
+        so only one record dict is alive at a time and downstream filtering
+        can start before the whole file has been decoded.
+        """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                for line in f:
-                    try:
-                        records.append(json.loads(line.strip()))
-                    except json.JSONDecodeError as e:
-                        logger.error(f"Error decoding JSON from line: {line.strip()} - {e}")
-            logger.info(f"Successfully read {len(records)} records from {file_path}")
+            with open(file_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    logger.info(f"File {file_path} is empty")
+                    return
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for line in iter(mm.readline, b''):
+                        if not line.strip():
+                            continue
+                        try:
+                            yield orjson.loads(line)
+                        except orjson.JSONDecodeError as e:
+                            logger.error(f"Error decoding JSON from line: {line.decode('utf-8', 'replace').strip()} - {e}")
         except FileNotFoundError:
             logger.error(f"File not found: {file_path}")
-        except Exception as e:
+        except OSError as e:
             logger.error(f"Failed to read records from file {file_path}: {e}")
+
+    def read_records_from_file(self, file_path: str) -> List[Dict[str, Any]]:
+        """Read records from a text file into a list"""
+        records = list(self.iter_records_from_file(file_path))
+        logger.info(f"Successfully read {len(records)} records from {file_path}")
         return records
 
+    def _load_structure_cache(self) -> tuple:
+        """Return (etag, cached_at, structure) from the on-disk cache."""
+        try:
+            with open(self.structure_cache_path, 'rb') as f:
+                cached = orjson.loads(f.read())
+            return cached.get('etag'), cached.get('cached_at', 0), cached.get('structure')
+        except FileNotFoundError:
+            return None, 0, None
+        except Exception as e:
+            logger.warning(f"Could not load structure cache {self.structure_cache_path}: {e}")
+            return None, 0, None
+
+    def _save_structure_cache(self, etag: Optional[str], structure: Dict[str, Any]):
+        """Persist the table structure and its ETag for conditional GETs."""
+        try:
+            with open(self.structure_cache_path, 'wb') as f:
+                f.write(orjson.dumps({'etag': etag, 'cached_at': time.time(), 'structure': structure}))
+        except Exception as e:
+            logger.warning(f"Could not save structure cache {self.structure_cache_path}: {e}")
+
     def get_grist_table_structure(self) -> Dict[str, Any]:
         """Get Grist table structure to understand expected field types"""
+        cached_etag, cached_at, cached_structure = self._load_structure_cache()
+
+        # Time-based fallback: within the TTL the cached schema is trusted
+        # outright and no request is made at all. Off (0) by default since
+        # the ETag revalidation below is already a cheap 304 round trip.
+        if cached_structure is not None and self.structure_cache_ttl > 0:
+            if time.time() - cached_at < self.structure_cache_ttl:
+                logger.debug("Grist table structure cache within TTL, skipping revalidation")
+                return cached_structure
+
         try:
-            response = requests.get(
-                f"{self.grist_base_host}/api/docs/{self.grist_doc_id}/tables/{self.grist_table_name}/columns",
-                headers=self.grist_headers
-            )
+            request_headers = None
+            if cached_etag and cached_structure is not None:
+                request_headers = {'If-None-Match': cached_etag}
+
+            # The session already carries the auth headers
+            response = self.session.get(self.columns_url, headers=request_headers)
+
+            # Schema unchanged since last run - reuse the cached copy
+            if response.status_code == 304 and cached_structure is not None:
+                logger.debug("Grist table structure unchanged (ETag match), using cached copy")
+                return cached_structure
+
             response.raise_for_status()
-            
-            data = response.json()
+
+            data = orjson.loads(response.content)
             columns = data.get('columns', [])
             
             logger.debug("=== GRIST TABLE STRUCTURE ===")
@@ -121,88 +465,99 @@ class GristBankUpdater:
                     'label': col_label
                 }
                 logger.debug(f"Column: {col_id} ('{col_label}') - Type: {col_type}")
-            
+
+            self._save_structure_cache(response.headers.get('ETag'), structure)
             return structure
-            
-        except Exception as e:
+
+        except (requests.RequestException, ValueError) as e:
             logger.error(f"Failed to get Grist table structure: {e}")
             return {}
 
-    def get_recent_grist_records(self, limit: int = 100) -> List[Dict[str, Any]]:
-        """Get a list of recent transaction records from Grist"""
+    # Reuse a fetched record list for this long within one run: both public
+    # views below are served by the same query, so the second caller gets
+    # the cached list instead of a second HTTP round trip
+    _RECENT_CACHE_TTL = 60.0
+
+    def _fetch_recent(self, limit: int = 500) -> List[GristRec]:
+        """
+        Fetch recent records sorted by Transaction Date descending, caching
+        the result briefly so the recent-records and last-datetime views
+        share one HTTP request.
+        """
+        cached = self._recent_cache
+        if cached is not None:
+            cached_at, cached_limit, records = cached
+            if cached_limit >= limit and time.monotonic() - cached_at < self._RECENT_CACHE_TTL:
+                return records
+
         try:
             # Get records sorted by Transaction Date descending
-            response = requests.get(
-                f"{self.grist_base_url}/records?sort=-Transaction_Date&limit={limit}",
-                headers=self.grist_headers
+            response = self.session.get(
+                f"{self.records_url}?sort=-Transaction_Date&limit={limit}"
             )
             response.raise_for_status()
-            
-            data = response.json()
-            records = [rec.get('fields', {}) for rec in data.get('records', [])]
-            
-            logger.debug(f"Retrieved {len(records)} recent records from Grist for comparison.")
-            if records:
-                # Assuming records are sorted by date descending, the first one is the latest
-                last_grist_record = records[0]
-                logger.info(f"Last record found in Grist: Transaction Date: {last_grist_record.get('Transaction_Date')}, Description: {last_grist_record.get('Transaction_Description')}, Amount: {last_grist_record.get('Transaction_Amount')}")
-            else:
-                logger.info("No existing records found in Grist.")
-            return records
-            
-        except Exception as e:
+
+            # Decode the raw bytes with orjson rather than response.json().
+            # The three compared columns are lifted into tuple slots for the
+            # hot loops; raw keeps the complete fields dict, since public
+            # consumers (get_last_grist_record.py) display every column
+            data = orjson.loads(response.content)
+            records = []
+            for rec in data.get('records', []):
+                fields = rec.get('fields', {})
+                records.append(GristRec(
+                    fields.get('Transaction_Date'),
+                    fields.get('Transaction_Description'),
+                    fields.get('Transaction_Amount'),
+                    fields
+                ))
+        except (requests.RequestException, ValueError) as e:
             logger.error(f"Failed to get recent Grist records: {e}")
             return []
 
-    def _record_matches(self, file_record: Dict[str, Any], grist_record: Dict[str, Any]) -> bool:
-        """
-        Compares a record from the file with a record from Grist based on key fields.
-        """
-        # Get bank name from the file record for proper date formatting
-        bank_name = file_record.get('Bank')
-        
-        file_date = self.normalize_date(file_record.get('Transaction Date'), bank_name)
-        file_desc = file_record.get('Transaction Description')
-        file_amount = self.normalize_amount(file_record.get('Transaction Amount'))
+        self._recent_cache = (time.monotonic(), limit, records)
+        return records
 
-        grist_date = self.normalize_date(grist_record.get('Transaction_Date'), bank_name)
-        grist_desc = grist_record.get('Transaction_Description')
-        grist_amount = self.normalize_amount(grist_record.get('Transaction_Amount'))
-        
-        # Basic check for None values before comparison
-        if any(val is None for val in [file_date, file_desc, file_amount, grist_date, grist_desc, grist_amount]):
-            return False
+    def get_recent_grist_records(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Get a list of recent transaction records from Grist"""
+        # Fetch only what was asked for; a wider cached fetch from the
+        # duplicate-detection path is still reused when present
+        records = self._fetch_recent(limit)[:limit]
 
-        # Compare normalized values
-        return (file_date == grist_date and
-                file_desc == grist_desc and
-                file_amount == grist_amount)
+        logger.debug(f"Retrieved {len(records)} recent records from Grist for comparison.")
+        if records:
+            # Assuming records are sorted by date descending, the first one is the latest
+            last = records[0]
+            logger.info(f"Last record found in Grist: Transaction Date: {last.date}, Description: {last.desc}, Amount: {last.amount}")
+        else:
+            logger.info("No existing records found in Grist.")
+        # Keep the dict view at this public boundary
+        return [rec.raw for rec in records]
 
     def _parse_date_string(self, date_string: str, bank_name: Optional[str] = None) -> Optional[datetime]:
         if not date_string:
             return None
         
         cleaned_date_string = str(date_string).strip()
-        
-        # ADD THIS DEBUG CODE TO TRACE THE ISSUE
-        logger.debug(f"=== DATE PARSING DEBUG ===")
-        logger.debug(f"Input date_string: {repr(date_string)}")
-        logger.debug(f"Input type: {type(date_string)}")
-        logger.debug(f"Cleaned date_string: {repr(cleaned_date_string)}")
-        logger.debug(f"Is digit check: {cleaned_date_string.isdigit()}")
-        
-        # If it's a suspicious timestamp, log the stack trace
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("=== DATE PARSING DEBUG ===")
+            logger.debug("Input date_string: %r (type %s), cleaned: %r", date_string, type(date_string), cleaned_date_string)
+
+        # Flag timestamp-shaped dates, but cap the noise: after a few
+        # warnings the rest of the run stays quiet. The old stack-trace
+        # collection here walked every frame per occurrence for no gain.
         if cleaned_date_string.isdigit() and len(cleaned_date_string) == 10:
-            import traceback
-            logger.warning(f"SUSPICIOUS TIMESTAMP DETECTED: {cleaned_date_string}")
-            logger.warning(f"Call stack: {traceback.format_stack()}")
+            if self._ts_warn_count < self._TS_WARN_CAP:
+                self._ts_warn_count += 1
+                logger.warning("Timestamp-shaped date %s", cleaned_date_string)
         
         # Try to parse as Unix timestamp first if it looks like a number
         try:
             # Check if it's a string that can be converted to an integer
             if cleaned_date_string.isdigit():
                 timestamp = int(cleaned_date_string)
-                logger.debug(f"Parsed as integer timestamp: {timestamp}")
+                logger.debug("Parsed as integer timestamp: %s", timestamp)
                 
                 # Basic sanity check for timestamp range
                 if 0 <= timestamp <= 4102444800: # Approx. end of 2100
@@ -210,129 +565,30 @@ class GristBankUpdater:
                     logger.warning(f"CONVERTING TIMESTAMP TO DATE: {timestamp} -> {parsed_dt}")
                     return parsed_dt
                 else:
-                    logger.debug(f"Timestamp {timestamp} outside valid range, treating as string")
+                    logger.debug("Timestamp %s outside valid range, treating as string", timestamp)
         except ValueError:
             logger.debug("Not a valid integer, proceeding to string parsing")
         except (ValueError, OSError) as e:
             logger.warning(f"Error parsing '{cleaned_date_string}' as timestamp: {e}")
 
-        # Continue with your existing string parsing logic...
-        logger.debug(f"Proceeding with string date parsing for: {cleaned_date_string}")
-
-
-        # Existing string parsing logic
-        if 'am' in cleaned_date_string:
-            cleaned_date_string = cleaned_date_string.replace('am', 'AM')
-        if 'pm' in cleaned_date_string:
-            cleaned_date_string = cleaned_date_string.replace('pm', 'PM')
-
-        # Define formats - FIXED: Added missing %d-%m-%Y %H:%M:%S format
-        mm_dd_yyyy_formats = [
-            '%m-%d-%Y %I:%M:%S %p', '%m-%d-%Y %H:%M:%S', '%m-%d-%Y',
-            '%m/%d/%Y %H:%M:%S', '%m/%d/%Y'
-        ]
-        dd_mm_yyyy_formats = [
-            '%d-%m-%Y %H:%M:%S',
-            '%d/%m/%Y %H:%M:%S', 
-            '%d-%m-%Y %I:%M:%S %p', 
-            '%d-%m-%Y %I:%M%p',
-            '%d-%m-%Y',
-            '%d/%m/%y' # Added for DD/MM/YY format like 11/7/25
-        ]
-        yyyy_formats = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d']
-
-        parsed_dt = None
-
-        # Log the bank name and date string for debugging
-        logger.debug(f"Parsing date '{cleaned_date_string}' for bank '{bank_name}'")
-
-        if bank_name and bank_name.upper() == 'ICICI':
-            logger.debug("ICICI bank detected. Trying MM-DD-YYYY formats first.")
-            for fmt in mm_dd_yyyy_formats:
-                try:
-                    logger.debug(f"Attempting to parse '{cleaned_date_string}' with format '{fmt}'")
-                    parsed_dt = datetime.strptime(cleaned_date_string, fmt)
-                    logger.debug(f"Successfully parsed '{cleaned_date_string}' with format '{fmt}'")
-                    break # Found a match
-                except ValueError:
-                    logger.debug(f"Failed to parse '{cleaned_date_string}' with format '{fmt}'")
-                    continue
-            
-            if not parsed_dt: # If MM-DD-YYYY failed, try DD-MM-YYYY as fallback for ICICI
-                logger.debug("MM-DD-YYYY formats failed for ICICI. Trying DD-MM-YYYY formats.")
-                for fmt in dd_mm_yyyy_formats:
-                    try:
-                        logger.debug(f"Attempting to parse '{cleaned_date_string}' with format '{fmt}'")
-                        parsed_dt = datetime.strptime(cleaned_date_string, fmt)
-                        logger.debug(f"Successfully parsed '{cleaned_date_string}' with format '{fmt}'")
-                        break
-                    except ValueError:
-                        logger.debug(f"Failed to parse '{cleaned_date_string}' with format '{fmt}'")
-                        continue
-        else:
-            logger.debug("Non-ICICI bank or no bank specified.")
-            
-            # Prioritize the specific format 'DD/MM/YYYY HH:MM:SS' for non-ICICI banks
-            specific_format = '%d/%m/%Y %H:%M:%S'
-            try:
-                logger.debug(f"Attempting to parse '{cleaned_date_string}' with specific format '{specific_format}'")
-                parsed_dt = datetime.strptime(cleaned_date_string, specific_format)
-                logger.debug(f"Successfully parsed '{cleaned_date_string}' with format '{specific_format}'")
-            except ValueError:
-                logger.debug(f"Failed to parse '{cleaned_date_string}' with specific format '{specific_format}'. Trying other formats.")
-                parsed_dt = None # Ensure parsed_dt is None if specific format fails
-
-            # If specific format failed, try other formats
-            if not parsed_dt:
-                logger.debug("Trying DD-MM-YYYY formats.")
-                for fmt in dd_mm_yyyy_formats:
-                    try:
-                        logger.debug(f"Attempting to parse '{cleaned_date_string}' with format '{fmt}'")
-                        parsed_dt = datetime.strptime(cleaned_date_string, fmt)
-                        logger.debug(f"Successfully parsed '{cleaned_date_string}' with format '{fmt}'")
-                        break # Found a match
-                    except ValueError:
-                        logger.debug(f"Failed to parse '{cleaned_date_string}' with format '{fmt}'")
-                        continue
-            
-            if not parsed_dt: # If DD-MM-YYYY failed, try MM-DD-YYYY
-                logger.debug("DD-MM-YYYY formats failed. Trying MM-DD-YYYY formats.")
-                for fmt in mm_dd_yyyy_formats:
-                    try:
-                        logger.debug(f"Attempting to parse '{cleaned_date_string}' with format '{fmt}'")
-                        parsed_dt = datetime.strptime(cleaned_date_string, fmt)
-                        logger.debug(f"Successfully parsed '{cleaned_date_string}' with format '{fmt}'")
-                        break
-                    except ValueError:
-                        logger.debug(f"Failed to parse '{cleaned_date_string}' with format '{fmt}'")
-                        continue
+        # Continue with string parsing via the cached format cascade
+        logger.debug("Proceeding with string date parsing for: %s", cleaned_date_string)
 
-        # Try YYYY formats as a last resort if not parsed yet
-        if not parsed_dt:
-            for fmt in yyyy_formats:
-                try:
-                    logger.debug(f"Attempting to parse '{cleaned_date_string}' with format '{fmt}'")
-                    parsed_dt = datetime.strptime(cleaned_date_string, fmt)
-                    logger.debug(f"Successfully parsed '{cleaned_date_string}' with format '{fmt}'")
-                    break
-                except ValueError:
-                    logger.debug(f"Failed to parse '{cleaned_date_string}' with format '{fmt}'")
-                    continue
+        bank_upper = bank_name.upper() if bank_name else None
+        parsed_dt = _parse_date_string_cached(cleaned_date_string, bank_upper)
 
         if not parsed_dt:
             logger.warning(f"Could not parse date: {date_string}")
-        
+
         return parsed_dt
     
     def normalize_date(self, date_value: Any, bank_name: Optional[str] = None) -> Optional[datetime]: # Return type changed
         """Parse date value into a datetime object.""" # Docstring updated
         if not date_value:
             return None
-        # ADD DEBUG LOGGING HERE
-        logger.debug(f"=== NORMALIZE_DATE DEBUG ===")
-        logger.debug(f"Input date_value: {repr(date_value)}")
-        logger.debug(f"Input type: {type(date_value)}")
-        logger.debug(f"Bank name: {bank_name}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("=== NORMALIZE_DATE DEBUG ===")
+            logger.debug("Input date_value: %r (type %s), bank: %s", date_value, type(date_value), bank_name)
         try:
             dt = None
             # If it's already a datetime object
@@ -344,9 +600,9 @@ class GristBankUpdater:
             
             if dt:
                 # Logging remains for context, but we return the datetime object.
-                if bank_name and bank_name.upper() == 'ICICI':
+                if bank_name and bank_name.upper() == 'ICICI' and logger.isEnabledFor(logging.DEBUG):
                     formatted_date_for_log = dt.strftime('%d/%m/%Y %H:%M:%S')
-                    logger.info(f"ICICI bank: Converting date {date_value} -> {formatted_date_for_log}")
+                    logger.debug("ICICI bank: Converting date %s -> %s", date_value, formatted_date_for_log)
                 
                 return dt # Return the datetime object
             else:
@@ -363,75 +619,83 @@ class GristBankUpdater:
             return None
         
         try:
-            # Remove currency symbols and commas
-            if isinstance(amount_value, str):
-                amount_str = amount_value.replace('$', '').replace(',', '').replace('₹', '').strip()
-                if not amount_str:
-                    return None
-                return float(amount_str)
-            
-            return float(amount_value)
-            
+            # JSON-decoded amounts are often already numeric - skip the
+            # string cleanup entirely for those
+            if isinstance(amount_value, (int, float)):
+                return float(amount_value)
+
+            # Remove currency symbols, commas and whitespace in one pass
+            amount_str = str(amount_value).translate(_AMOUNT_STRIP)
+            if not amount_str:
+                return None
+            return float(amount_str)
+
         except Exception as e:
             logger.warning(f"Failed to normalize amount {amount_value}: {e}")
             return None
 
-    def prepare_grist_record(self, sheet_record: Dict[str, Any], grist_structure: Dict[str, Any]) -> Dict[str, Any]:
+    def _build_field_map(self, grist_structure: Dict[str, Any]) -> Dict[str, Tuple[str, str]]:
+        """
+        Flatten field resolution into one dict of
+        {sheet field name: (grist column id, grist type)}.
+
+        Folds the explicit Google->Grist mapping, the column labels and the
+        raw column ids together once, so preparing a record is a single
+        dict lookup per field instead of a mapping walk plus structure scans.
+        """
+        field_map: Dict[str, Tuple[str, str]] = {}
+        for col_id, info in grist_structure.items():
+            entry = (col_id, info['type'])
+            field_map[col_id] = entry
+            label = info.get('label')
+            if label:
+                field_map.setdefault(label, entry)
+        for sheet_field, grist_field in self.GOOGLE_TO_GRIST_MAP.items():
+            if grist_field in grist_structure:
+                field_map[sheet_field] = (grist_field, grist_structure[grist_field]['type'])
+        return field_map
+
+    def prepare_grist_record(self, sheet_record: Dict[str, Any], grist_structure: Dict[str, Any],
+                             field_map: Optional[Dict[str, Tuple[str, str]]] = None) -> Dict[str, Any]:
         """Prepare a record for Grist based on the table structure"""
         normalized_record = {}
-        
-        # Define the mapping from Google Sheets field names to Grist field names
-        google_to_grist_map = {
-            'Transaction Date': 'Transaction_Date',
-            'Transaction Description': 'Transaction_Description',
-            'Transaction Amount': 'Transaction_Amount',
-            'Reference No.': 'Reference_No',
-            'Value Date': 'Value_Date'
-        }
+
+        # Build the resolution map once here if the caller didn't precompute
+        # it for a whole batch
+        if field_map is None:
+            field_map = self._build_field_map(grist_structure)
 
         bank_name = sheet_record.get('Bank') # Get the bank name
-        logger.info(f"--- prepare_grist_record ---")
-        logger.info(f"Processing record for Bank: {bank_name}")
-        logger.info(f"Original sheet_record: {sheet_record}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("--- prepare_grist_record ---")
+            logger.debug("Processing record for Bank: %s", bank_name)
+            logger.debug("Original sheet_record: %s", sheet_record)
 
         for field_name, field_value in sheet_record.items():
             if field_value is None or field_value == '':
                 continue
-                
-            grist_field = None
-            # Check if the field is in our explicit mapping
-            if field_name in google_to_grist_map:
-                grist_field = google_to_grist_map[field_name]
-            else:
-                # If not in explicit mapping, try to find it in Grist structure by label or ID
-                for grist_col_id, grist_col_info in grist_structure.items():
-                    if grist_col_info['label'] == field_name or grist_col_id == field_name:
-                        grist_field = grist_col_id
-                        break
-            
-            if not grist_field:
+
+            # Explicit mapping, labels and ids were all flattened into one
+            # lookup by _build_field_map
+            entry = field_map.get(field_name)
+            if not entry:
                 logger.warning(f"Field '{field_name}' not found in Grist structure or explicit mapping, skipping")
                 continue
-            
-            # Get Grist field type from the structure (assuming grist_field is now valid)
-            if grist_field not in grist_structure:
-                logger.warning(f"Mapped Grist field '{grist_field}' for Google Sheets field '{field_name}' not found in Grist structure, skipping")
-                continue
 
-            grist_type = grist_structure[grist_field]['type']
-            logger.debug(f"Field '{field_name}' -> Grist field '{grist_field}' (type: {grist_type})")
+            grist_field, grist_type = entry
+            logger.debug("Field '%s' -> Grist field '%s' (type: %s)", field_name, grist_field, grist_type)
             
             normalized_value = None
             if grist_type == 'Date':
                 # Pass bank_name to normalize_date
                 normalized_value = self.normalize_date(field_value, bank_name)
-                logger.info(f"Date field '{field_name}': {field_value} -> {normalized_value} (Bank: {bank_name})")
+                logger.debug("Date field '%s': %s -> %s (Bank: %s)", field_name, field_value, normalized_value, bank_name)
             elif grist_type == 'Numeric':
                 normalized_value = self.normalize_amount(field_value)
             elif field_name in ['Transaction Date', 'Value Date']:
                 # Force date normalization for known date fields regardless of Grist type
                 normalized_value = self.normalize_date(field_value, bank_name)
-                logger.info(f"Forced date normalization for '{field_name}': {field_value} -> {normalized_value} (Bank: {bank_name})")
+                logger.debug("Forced date normalization for '%s': %s -> %s (Bank: %s)", field_name, field_value, normalized_value, bank_name)
             else:
                 # Text or other types
                 normalized_value = str(field_value) if field_value else None
@@ -439,9 +703,85 @@ class GristBankUpdater:
             if normalized_value is not None:
                 normalized_record[grist_field] = normalized_value
         
-        logger.info(f"Final normalized record: {normalized_record}")
+        logger.debug("Final normalized record: %s", normalized_record)
         return normalized_record
     
+    def prepare_grist_records(self, sheet_records: List[Dict[str, Any]], grist_structure: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Columnar counterpart of prepare_grist_record for whole batches.
+
+        Resolves each sheet field to its Grist column and type once, then
+        normalizes column by column, so field resolution and type dispatch
+        are paid per column instead of per cell.
+        """
+        if not sheet_records:
+            return []
+
+        field_map = self._build_field_map(grist_structure)
+
+        # Union of field names across the batch, in first-seen order
+        field_names = dict()
+        for record in sheet_records:
+            for name in record:
+                field_names.setdefault(name)
+
+        banks = [record.get('Bank') for record in sheet_records]
+        normalized_records: List[Dict[str, Any]] = [{} for _ in sheet_records]
+
+        for field_name in field_names:
+            entry = field_map.get(field_name)
+            if not entry:
+                logger.warning(f"Field '{field_name}' not found in Grist structure or explicit mapping, skipping")
+                continue
+
+            grist_field, grist_type = entry
+
+            if grist_type == 'Date' or field_name in ('Transaction Date', 'Value Date'):
+                # Bank columns repeat the same few date strings; normalize
+                # each distinct (value, bank) once and map the rest through
+                # the memo - the dict lookup stands in for a vectorized pass
+                normalize = self.normalize_date
+                memo: Dict[Any, Any] = {}
+                for out, record, bank in zip(normalized_records, sheet_records, banks):
+                    field_value = record.get(field_name)
+                    if field_value is None or field_value == '':
+                        continue
+                    memo_key = (field_value, bank) if isinstance(field_value, str) else None
+                    if memo_key is not None and memo_key in memo:
+                        normalized_value = memo[memo_key]
+                    else:
+                        normalized_value = normalize(field_value, bank)
+                        if memo_key is not None:
+                            memo[memo_key] = normalized_value
+                    if normalized_value is not None:
+                        out[grist_field] = normalized_value
+            elif grist_type == 'Numeric':
+                normalize = self.normalize_amount
+                memo = {}
+                for out, record in zip(normalized_records, sheet_records):
+                    field_value = record.get(field_name)
+                    if field_value is None or field_value == '':
+                        continue
+                    if isinstance(field_value, str):
+                        if field_value in memo:
+                            normalized_value = memo[field_value]
+                        else:
+                            normalized_value = memo[field_value] = normalize(field_value)
+                    else:
+                        normalized_value = normalize(field_value)
+                    if normalized_value is not None:
+                        out[grist_field] = normalized_value
+            else:
+                # Text or other types
+                for out, record in zip(normalized_records, sheet_records):
+                    field_value = record.get(field_name)
+                    if field_value is None or field_value == '':
+                        continue
+                    out[grist_field] = str(field_value)
+
+        # Drop records where nothing normalized, mirroring prepare_grist_record
+        return [record for record in normalized_records if record]
+
     def _create_grist_record(self, record_data: Dict[str, Any]) -> bool:
         """Helper to create a single record in Grist with enhanced error handling"""
         return self.create_grist_records_bulk([record_data])
@@ -453,44 +793,73 @@ class GristBankUpdater:
             return True # Nothing to do, consider it successful
 
         try:
-            payload = {
-                "records": [
-                    {"fields": record} for record in records_data
-                ]
-            }
-            
-            # Log the payload for debugging
-            logger.debug(f"Sending bulk payload to Grist: {json.dumps(payload, indent=2)}")
-            
-            response = requests.post(
-                f"{self.grist_base_url}/records",
-                headers=self.grist_headers,
-                json=payload
-            )
-            
-            # Enhanced error handling
-            if response.status_code != 200:
-                logger.error(f"Grist API error during bulk insert: {response.status_code}")
-                logger.error(f"Response headers: {response.headers}")
-                logger.error(f"Response content: {response.text}")
-                
-                # Try to parse error details
-                try:
-                    error_data = response.json()
-                    logger.error(f"Error details: {json.dumps(error_data, indent=2)}")
-                except:
-                    pass
-                
+            # Insert in batches so a huge daily file never produces one
+            # oversized POST body that Grist might reject or time out on
+            starts = range(0, len(records_data), self.bulk_batch_size)
+            batches = [(start, records_data[start:start + self.bulk_batch_size]) for start in starts]
+
+            if len(batches) == 1:
+                results = [self._post_record_batch(*batches[0])]
+            else:
+                # Keep several batches in flight at once over the pooled
+                # session: total latency approaches one round trip instead
+                # of one per batch
+                with ThreadPoolExecutor(max_workers=min(4, len(batches))) as executor:
+                    results = list(executor.map(lambda args: self._post_record_batch(*args), batches))
+
+            # A failed batch no longer aborts the rest of the insert; report
+            # how far we actually got so partial progress is visible
+            created_count = sum(len(batch) for (_, batch), ok in zip(batches, results) if ok)
+
+            if created_count < len(records_data):
+                logger.error(f"Bulk insert partially failed: {created_count} of {len(records_data)} records created.")
                 return False
-            
-            response.raise_for_status()
-            
-            logger.info(f"Successfully created {len(records_data)} records in Grist via bulk insert.")
+
+            logger.info(f"Successfully created {created_count} records in Grist via bulk insert.")
             return True
-            
-        except Exception as e:
+
+        except (requests.RequestException, ValueError) as e:
             logger.error(f"Failed to create Grist records in bulk: {e}")
             return False
+
+    def _post_record_batch(self, start: int, batch: List[Dict[str, Any]]) -> bool:
+        """POST a single batch of records to Grist. Returns True on success."""
+        payload = {
+            "records": [
+                {"fields": record} for record in batch
+            ]
+        }
+
+        # Log the payload for debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Sending bulk payload to Grist: %s", orjson.dumps(payload, option=orjson.OPT_INDENT_2).decode())
+
+        # Serialize with orjson (also handles datetime fields natively)
+        # instead of letting requests run the payload through stdlib json
+        response = self.session.post(
+            self.records_url,
+            data=orjson.dumps(payload)
+        )
+
+        # Enhanced error handling
+        if response.status_code != 200:
+            logger.error(f"Grist API error during bulk insert (records {start + 1}-{start + len(batch)}): {response.status_code}")
+            logger.error(f"Response headers: {response.headers}")
+            logger.error(f"Response content: {response.text}")
+
+            # Try to parse error details; the pretty-printed dump is only
+            # worth the serialization cost when someone will read it
+            if logger.isEnabledFor(logging.DEBUG):
+                try:
+                    error_data = orjson.loads(response.content)
+                    logger.debug("Error details: %s", orjson.dumps(error_data, option=orjson.OPT_INDENT_2).decode())
+                except ValueError:
+                    pass
+
+            return False
+
+        response.raise_for_status()
+        return True
     
     def test_grist_connection(self):
         """Test the Grist connection with enhanced debugging"""
@@ -501,18 +870,16 @@ class GristBankUpdater:
             logger.debug(f"Table name: {self.grist_table_name}")
             
             # Test basic connection
-            response = requests.get(
-                f"{self.grist_base_host}/api/docs/{self.grist_doc_id}",
-                headers=self.grist_headers
+            response = self.session.get(
+                f"{self.grist_base_host}/api/docs/{self.grist_doc_id}"
             )
             
             if response.status_code == 200:
                 logger.debug("✓ Grist connection successful")
                 
                 # Test table access
-                table_response = requests.get(
-                    f"{self.grist_base_url}/records?limit=1",
-                    headers=self.grist_headers
+                table_response = self.session.get(
+                    f"{self.records_url}?limit=1"
                 )
                 
                 if table_response.status_code == 200:
@@ -528,7 +895,7 @@ class GristBankUpdater:
                 logger.error(f"Response: {response.text}")
                 return False
                 
-        except Exception as e:
+        except requests.RequestException as e:
             logger.error(f"✗ Grist connection test failed: {e}")
             return False
         
@@ -538,22 +905,14 @@ class GristBankUpdater:
         Returns (last_datetime, list_of_records_with_that_datetime)
         """
         try:
-            # Get records sorted by Transaction Date descending
-            response = requests.get(
-                f"{self.grist_base_url}/records?sort=-Transaction_Date&limit={limit}",
-                headers=self.grist_headers
-            )
-            response.raise_for_status()
-            
-            data = response.json()
-            all_records = [rec.get('fields', {}) for rec in data.get('records', [])]
-            
+            all_records = self._fetch_recent(limit)
+
             if not all_records:
                 logger.info("No existing records found in Grist.")
                 return None, []
             
             # Get the most recent datetime
-            last_datetime_raw = all_records[0].get('Transaction_Date') # Keep raw for comparison logic
+            last_datetime_raw = all_records[0].date # Keep raw for comparison logic
             if not last_datetime_raw:
                 logger.warning("Most recent record has no Transaction_Date")
                 return None, []
@@ -570,8 +929,7 @@ class GristBankUpdater:
             # Find ALL records that share this same datetime
             records_with_last_datetime = []
             for record in all_records:
-                record_datetime = record.get('Transaction_Date')
-                if record_datetime == last_datetime_raw: # Compare with raw for logic
+                if record.date == last_datetime_raw: # Compare with raw for logic
                     records_with_last_datetime.append(record)
                 else:
                     # Since records are sorted by date desc, we can break here
@@ -582,15 +940,75 @@ class GristBankUpdater:
             
             # Log details of these records for debugging
             for i, record in enumerate(records_with_last_datetime):
-                logger.debug(f"Last datetime record {i+1}: {record.get('Transaction_Description')} - Amount: {record.get('Transaction_Amount')}")
+                logger.debug("Last datetime record %d: %s - Amount: %s", i + 1, record.desc, record.amount)
             
             return last_datetime_raw, records_with_last_datetime # Return raw for comparison logic
             
-        except Exception as e:
+        except (requests.RequestException, ValueError) as e:
             logger.error(f"Failed to get last processed datetime and records: {e}")
             return None, []
 
-    def should_process_record(self, file_record: Dict[str, Any], file_dt_obj: Optional[datetime], last_dt_obj: Optional[datetime], last_datetime_records: List[Dict[str, Any]]) -> bool:
+    def _load_seen_digests(self) -> set:
+        """Load the persisted dedup digest set, empty on first run."""
+        try:
+            with open(self.dedup_cache_path, 'rb') as f:
+                digests = set(orjson.loads(f.read()))
+            logger.info(f"Loaded {len(digests)} transaction digests from {self.dedup_cache_path}")
+            return digests
+        except FileNotFoundError:
+            return set()
+        except Exception as e:
+            logger.warning(f"Could not load dedup cache {self.dedup_cache_path}: {e}")
+            return set()
+
+    def _save_seen_digests(self):
+        """Persist the dedup digest set for the next run."""
+        try:
+            with open(self.dedup_cache_path, 'wb') as f:
+                f.write(orjson.dumps(sorted(self._seen_key_digests)))
+        except Exception as e:
+            logger.warning(f"Could not save dedup cache {self.dedup_cache_path}: {e}")
+
+    def _dedup_digest(self, file_record: Dict[str, Any], file_dt_obj: Optional[datetime],
+                      amount: Optional[float] = None) -> Optional[str]:
+        """
+        Compact digest of the (date, description, amount) identity of a
+        record. Returns None when any key component is missing, since a
+        partial key cannot safely identify a duplicate. Callers that have
+        already normalized the amount can pass it to skip the re-parse.
+        """
+        if not file_dt_obj:
+            return None
+        desc = file_record.get('Transaction Description')
+        if amount is None:
+            amount = self.normalize_amount(file_record.get('Transaction Amount'))
+        if desc is None or amount is None:
+            return None
+        key = f"{file_dt_obj.isoformat()}|{desc}|{amount}"
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _build_duplicate_keys(self, grist_records: List[GristRec]) -> set:
+        """
+        Build a set of (date, description, amount) keys from Grist records so
+        duplicate checks are O(1) membership tests instead of re-normalizing
+        every Grist record per file record. Returned frozen since it is
+        read-only for the rest of the run.
+        """
+        keys = set()
+        for grist_record in grist_records:
+            grist_date = self.normalize_date(grist_record.date, None)
+            grist_desc = grist_record.desc
+            grist_amount = self.normalize_amount(grist_record.amount)
+            # Skip incomplete records - they can never match a valid file record
+            if grist_date is None or grist_desc is None or grist_amount is None:
+                continue
+            # Compare amounts as integer paise so float representation
+            # differences between the file and Grist cannot defeat the match
+            keys.add((grist_date, grist_desc, round(grist_amount * 100)))
+        return frozenset(keys)
+
+    def should_process_record(self, file_record: Dict[str, Any], file_dt_obj: Optional[datetime], last_dt_obj: Optional[datetime], last_datetime_keys: set,
+                              file_amount: Optional[float] = None) -> bool:
         """
         Determine if a file record should be processed based on datetime and duplicate checking.
         Uses pre-parsed datetime objects for efficiency.
@@ -611,29 +1029,37 @@ class GristBankUpdater:
         try:
             # Use the passed-in datetime objects directly
             
-            # If file record is newer than last processed datetime, definitely process it
+            # If file record is newer than last processed datetime, definitely
+            # process it. No duplicate fingerprint is needed for this case, so
+            # return before any key construction; on a date-sorted file almost
+            # every record takes this branch.
             if file_dt_obj > last_dt_obj:
-                logger.debug(f"Record is newer than last processed datetime: {file_dt_obj} > {last_dt_obj}")
                 return True
-            
+
             # If file record is older than last processed datetime, skip it
             if file_dt_obj < last_dt_obj:
-                logger.debug(f"Record is older than last processed datetime: {file_dt_obj} < {last_dt_obj}")
                 return False
             
             # If file record has the same datetime as last processed datetime,
             # check if it's already in the Grist records with that datetime
             if file_dt_obj == last_dt_obj:
-                logger.debug(f"Record has same datetime as last processed: {file_dt_obj}")
-                
-                # Check if this record already exists in the last_datetime_records
-                for grist_record in last_datetime_records:
-                    if self._record_matches(file_record, grist_record):
-                        logger.debug(f"Record already exists in Grist: {file_record.get('Transaction Description')}")
-                        return False
-                
+                logger.debug("Record has same datetime as last processed: %s", file_dt_obj)
+
+                # Check if this record already exists among the Grist records
+                # sharing the last processed datetime (O(1) set lookup)
+                if file_amount is None:
+                    file_amount = self.normalize_amount(file_record.get('Transaction Amount'))
+                file_key = (
+                    file_dt_obj,
+                    file_record.get('Transaction Description'),
+                    round(file_amount * 100) if file_amount is not None else None
+                )
+                if file_key in last_datetime_keys:
+                    logger.debug("Record already exists in Grist: %s", file_record.get('Transaction Description'))
+                    return False
+
                 # Same datetime but not a duplicate, so process it
-                logger.debug(f"Record has same datetime but is not a duplicate, processing: {file_record.get('Transaction Description')}")
+                logger.debug("Record has same datetime but is not a duplicate, processing: %s", file_record.get('Transaction Description'))
                 return True
             
         except Exception as e:
@@ -642,14 +1068,45 @@ class GristBankUpdater:
         
         return True  # Default to processing
 
-    def update_grist_from_file(self):
+    def archive_file(self, file_path: str):
+        """Move the processed file to the archive directory"""
+        if not os.path.exists(file_path):
+            logger.warning(f"File to archive not found: {file_path}")
+            return
+
+        archive_path = os.path.join(self.archive_dir, os.path.basename(file_path))
+        try:
+            # If archive file already exists, add timestamp to make it unique
+            if os.path.exists(archive_path):
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                name, ext = os.path.splitext(archive_path)
+                archive_path = f"{name}_{timestamp}{ext}"
+
+            # os.replace is a single atomic syscall and, unlike os.rename,
+            # also succeeds on Windows if the destination appears between
+            # the existence check and the move
+            os.replace(file_path, archive_path)
+            logger.info(f"Successfully archived {file_path} to {archive_path}")
+        except Exception as e:
+            logger.error(f"Failed to archive file {file_path}: {e}")
+
+    def close(self):
+        """Release the pooled HTTP connections held by the session"""
+        self.session.close()
+
+    def update_grist_from_file(self, file_path: Optional[str] = None):
         """
         Reads records from the daily TXT file, identifies new transactions,
         writes them to output.csv, and then archives the file.
         Enhanced version that properly handles multiple records with the same datetime.
+
+        The caller may pass the data file path explicitly; recomputing it
+        from the clock here could pick a different day than the wrapper
+        script did across a midnight boundary.
         """
-        file_name = self._get_current_date_filename()
-        file_path = os.path.join(self.data_dir, file_name)
+        if file_path is None:
+            file_name = self._get_current_date_filename()
+            file_path = os.path.join(self.data_dir, file_name)
 
         if not os.path.exists(file_path):
             logger.error(f"Data file not found: {file_path}. Cannot process records.")
@@ -667,65 +1124,134 @@ class GristBankUpdater:
             # if not grist_structure:
             #     raise Exception("Failed to get Grist table structure")
 
-            # Read records from the file
-            file_records = self.read_records_from_file(file_path)
-            if not file_records:
-                logger.info("No records found in the data file. Nothing to process.")
-                self.archive_file(file_path)
-                return
+            # The Grist fetch is pure network latency and the file read is
+            # local I/O + JSON decoding, so overlap them instead of paying
+            # for both sequentially
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                grist_future = executor.submit(self.get_last_processed_datetime_and_records, 500)
 
-            # Log sample record to check Bank field
-            if file_records:
-                logger.info(f"Sample record from file: {file_records[0]}")
-                logger.info(f"Bank field value: '{file_records[0].get('Bank')}'")
+                # Get the last processed datetime and all records with that datetime
+                # This is still needed for duplicate matching logic
+                last_datetime, last_datetime_records = grist_future.result()
 
-            # Get the last processed datetime and all records with that datetime
-            # This is still needed for duplicate matching logic
-            last_datetime, last_datetime_records = self.get_last_processed_datetime_and_records(limit=500)
-            
-            # Filter records that need to be processed
+            # Normalize the boundary records once up front so the per-record
+            # duplicate check below is a set membership test
+            last_datetime_keys = self._build_duplicate_keys(last_datetime_records)
+
+            # last_datetime never changes inside the loop - parse it once
+            # here instead of once per file record, and keep the parse on
+            # self so repeat invocations in the same run skip it entirely
+            cached_last_dt = self._last_dt_cache
+            if cached_last_dt is not None and cached_last_dt[0] == last_datetime:
+                last_dt_obj = cached_last_dt[1]
+            else:
+                last_dt_obj = self.normalize_date(last_datetime, None) # bank_name is not available here
+                self._last_dt_cache = (last_datetime, last_dt_obj)
+
+            # Stream records off the file and filter in the same pass, so
+            # only the records that survive filtering are ever held in memory
             records_to_insert = []
-            for file_record in file_records:
-                # Parse file date once
+            insert_digests = []
+            total_records = 0
+            for file_record in self.iter_records_from_file(file_path):
+                total_records += 1
+                if total_records == 1 and logger.isEnabledFor(logging.DEBUG):
+                    # Log sample record to check Bank field; the guard keeps
+                    # the dict repr from being built on production INFO runs
+                    logger.debug("Sample record from file: %s; Bank: %r",
+                                 file_record, file_record.get('Bank'))
+                # Parse the date and amount exactly once per record; every
+                # downstream check reuses these instead of re-normalizing
                 file_dt_obj = self.normalize_date(file_record.get('Transaction Date'), file_record.get('Bank'))
-                
-                # Parse last_datetime once. Note: last_datetime is the raw string from Grist.
-                last_dt_obj = self.normalize_date(last_datetime, None) # bank_name is not available here
+                file_amount = self.normalize_amount(file_record.get('Transaction Amount'))
+
+                # Check the persistent dedup cache first - it also covers
+                # transactions older than the recent-records window
+                digest = self._dedup_digest(file_record, file_dt_obj, file_amount)
+                if digest and digest in self._seen_key_digests:
+                    logger.debug("Skipping record already in dedup cache: %s", file_record.get('Transaction Description'))
+                    continue
 
-                if self.should_process_record(file_record, file_dt_obj, last_dt_obj, last_datetime_records):
+                if self.should_process_record(file_record, file_dt_obj, last_dt_obj, last_datetime_keys, file_amount):
                     records_to_insert.append(file_record)
+                    insert_digests.append(digest)
                 else:
                     # Use file_dt_obj for logging if available, otherwise fall back to original date string
                     log_date = file_dt_obj if file_dt_obj else file_record.get('Transaction Date')
-                    logger.debug(f"Skipping record: {log_date} - {file_record.get('Transaction Description')}")
+                    logger.debug("Skipping record: %s - %s", log_date, file_record.get('Transaction Description'))
+
+            if total_records == 0:
+                logger.info("No records found in the data file. Nothing to process.")
+                self.archive_file(file_path)
+                return
 
-            logger.info(f"Identified {len(records_to_insert)} new records to process out of {len(file_records)} total file records.")
+            logger.info(f"Identified {len(records_to_insert)} new records to process out of {total_records} total file records.")
 
             # --- MODIFICATION START ---
             # Write new records to output.csv
             output_csv_path = 'output.csv'
             if records_to_insert:
+                # Write to a temp file and rename into place at the end, so a
+                # crash mid-write can never leave a truncated output.csv for
+                # the downstream upload to consume
+                tmp_csv_path = f"{output_csv_path}.{os.getpid()}.tmp"
                 try:
-                    with open(output_csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-                        # Get fieldnames from the first record, assuming all records have the same keys
-                        # Ensure fieldnames are consistent and handle potential missing keys gracefully
-                        # A more robust approach would be to collect all unique keys from all records
-                        all_keys = set()
-                        for record in records_to_insert:
-                            all_keys.update(record.keys())
-                        fieldnames = sorted(list(all_keys)) # Sort for consistent column order
+                    # 1 MiB buffer: the whole batch usually fits, so rows hit
+                    # the OS in a handful of large writes instead of many
+                    # default-sized flushes
+                    with open(tmp_csv_path, 'w', newline='', encoding='utf-8', buffering=1 << 20) as csvfile:
+                        # All records come from the same parser, so the first
+                        # record's keys normally cover the whole batch; only
+                        # fall back to the full key union if the schema turns
+                        # out not to be uniform. Columns keep their parse
+                        # order rather than being alphabetized, so the CSV
+                        # layout stays stable across runs even when a key
+                        # appears or disappears between days
+                        first_keys = records_to_insert[0].keys()
+                        if any(record.keys() != first_keys for record in records_to_insert):
+                            seen = dict.fromkeys(first_keys)
+                            for record in records_to_insert[1:]:
+                                for key in record:
+                                    seen.setdefault(key, None)
+                            fieldnames = list(seen)
+                        else:
+                            fieldnames = list(first_keys)
 
-                        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-                        writer.writeheader()
+                        # csv.writer instead of DictWriter: rows are built in
+                        # a reusable index-mapped buffer, so there is no
+                        # per-row dict rebuild. Cell positions come from the
+                        # key_idx map, never from a record's own insertion
+                        # order, so reordered or short records still land
+                        # under the right header
+                        writer = csv.writer(csvfile)
+                        writer.writerow(fieldnames)
+                        key_idx = {key: i for i, key in enumerate(fieldnames)}
+                        row_buffer = [''] * len(fieldnames)
                         for record in records_to_insert:
-                            # Ensure all keys are present in the row, fill missing with empty string
-                            row_to_write = {key: record.get(key, '') for key in fieldnames}
-                            writer.writerow(row_to_write)
+                            for key, value in record.items():
+                                row_buffer[key_idx[key]] = value
+                            writer.writerow(row_buffer)
+                            for key in record:
+                                row_buffer[key_idx[key]] = ''
+
+                    # Atomic on both POSIX and Windows
+                    os.replace(tmp_csv_path, output_csv_path)
                     logger.info(f"Successfully wrote {len(records_to_insert)} records to {output_csv_path}")
+
+                    # Remember what was handed off so later runs skip it even
+                    # once it falls outside the Grist recent-records window;
+                    # the digests were already computed in the filter loop
+                    for digest in insert_digests:
+                        if digest:
+                            self._seen_key_digests.add(digest)
+                    self._save_seen_digests()
                 except Exception as e:
                     logger.error(f"Failed to write records to {output_csv_path}: {e}")
                     # Continue to archiving even if CSV writing fails, as the core logic is to process records.
+                    try:
+                        os.unlink(tmp_csv_path)
+                    except OSError:
+                        pass
             else:
                 logger.info("No new records to process, skipping CSV output.")
             # --- MODIFICATION END ---
@@ -777,15 +1303,15 @@ class GristBankUpdater:
             # Re-raise the exception to be caught by the main handler if necessary
             raise
 
-def main():
+def main(file_path: Optional[str] = None):
     """Main function to run the Grist update from file"""
     try:
         updater = GristBankUpdater()
-        updater.update_grist_from_file()
+        updater.update_grist_from_file(file_path)
     except Exception as e:
         logger.error(f"Grist update script failed: {e}")
         return 1
     return 0
 
 if __name__ == "__main__":
-    exit(main())
+    exit(main(sys.argv[1] if len(sys.argv) > 1 else None))
@@ -1,5 +1,8 @@
+import importlib
 import os
 import subprocess
+import sys
+import threading
 from datetime import datetime
 import logging
 from logging.handlers import RotatingFileHandler
@@ -32,19 +35,36 @@ console_handler = logging.StreamHandler()
 console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 logger.addHandler(console_handler)
 
+# Resolved once at import instead of on every run_script call: prefer the
+# Windows venv interpreter when it exists, otherwise fall back to the
+# interpreter running this script so the wrapper also works on Linux/macOS
+_VENV_PY = os.path.join(os.path.dirname(__file__), 'venv', 'Scripts', 'python.exe')
+if not os.path.exists(_VENV_PY):
+    _VENV_PY = sys.executable
+
 def _get_current_date_filename() -> str:
     """Generate filename based on current date in ddmmyy.txt format"""
     return datetime.now().strftime("%d%m%y") + ".txt"
 
-def run_script(script_name: str) -> bool:
+def run_script(script_name: str, *args: str) -> bool:
     """Helper function to run a Python script using the virtual environment's python"""
-    venv_python_path = os.path.join(os.path.dirname(__file__), 'venv', 'Scripts', 'python.exe')
-    
     logger.info(f"Executing {script_name}...")
     try:
-        result = subprocess.run([venv_python_path, script_name], check=True, capture_output=True, text=True)
+        # Only buffer the child's stdout when it will actually be logged;
+        # at INFO and above it is discarded, so let the kernel drop it
+        # instead of piping every byte through this process. stderr is
+        # always captured for error reporting.
+        capture_stdout = logger.isEnabledFor(logging.DEBUG)
+        result = subprocess.run(
+            [_VENV_PY, script_name, *args],
+            check=True,
+            stdout=subprocess.PIPE if capture_stdout else subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True
+        )
         logger.info(f"{script_name} completed.")
-        logger.debug(f"{script_name} stdout:\n{result.stdout}")
+        if capture_stdout:
+            logger.debug(f"{script_name} stdout:\n{result.stdout}")
         if result.stderr:
             logger.warning(f"{script_name} stderr:\n{result.stderr}")
         return True
@@ -54,12 +74,61 @@ def run_script(script_name: str) -> bool:
         logger.error(f"{script_name} stderr:\n{e.stderr}")
         return False
     except FileNotFoundError:
-        logger.error(f"Python executable not found at {venv_python_path}. Ensure virtual environment is set up correctly.")
+        logger.error(f"Python executable not found at {_VENV_PY}. Ensure virtual environment is set up correctly.")
         return False
     except Exception as e:
         logger.error(f"An unexpected error occurred while executing {script_name}: {e}")
         return False
 
+def run_step(script_name: str, *args: str) -> bool:
+    """
+    Run one pipeline step in this process by importing the script as a
+    module and calling its main(), forwarding any extra arguments.
+
+    Spawning a fresh interpreter per step paid interpreter startup plus a
+    full re-import of the heavy dependencies three times per run; importing
+    once here pays it once. Falls back to run_script (subprocess) if the
+    module cannot be imported in-process.
+    """
+    module_name = script_name[:-3] if script_name.endswith('.py') else script_name
+    try:
+        module = importlib.import_module(module_name)
+    except Exception as e:
+        logger.warning(f"Could not import {module_name} in-process ({e}); falling back to subprocess.")
+        return run_script(script_name, *args)
+
+    logger.info(f"Executing {script_name} in-process...")
+    try:
+        exit_code = module.main(*args)
+    except Exception as e:
+        logger.error(f"Error executing {script_name}: {e}")
+        return False
+
+    if exit_code not in (0, None):
+        logger.error(f"{script_name} exited with status {exit_code}.")
+        return False
+
+    logger.info(f"{script_name} completed.")
+    return True
+
+def _start_upload_preflight():
+    """
+    Kick off uploadToGrist's connection test and structure probe in a
+    background thread so the HTTP round trips overlap the CSV build done
+    by createGristRecords.py. Returns the thread, or None if the module
+    cannot be imported in-process (the subprocess fallback will just run
+    the probes itself).
+    """
+    try:
+        upload_module = importlib.import_module('uploadToGrist')
+    except Exception as e:
+        logger.warning(f"Could not import uploadToGrist for preflight ({e}); skipping overlap.")
+        return None
+
+    thread = threading.Thread(target=upload_module.preflight, daemon=True)
+    thread.start()
+    return thread
+
 def main():
     data_dir = os.getenv('DATA_DIR', 'data')
     current_date_filename = _get_current_date_filename()
@@ -69,12 +138,15 @@ def main():
 
     if os.path.exists(file_path):
         logger.info(f"Data file '{current_date_filename}' already exists. Proceeding with Grist record creation.")
-        if not run_script('createGristRecords.py'):
+        preflight_thread = _start_upload_preflight()
+        # Pass the already-computed path down so the child does not
+        # recompute it from the clock and race a midnight boundary
+        if not run_step('createGristRecords.py', file_path):
             logger.error("createGristRecords.py failed. Exiting wrapper script.")
             return 1
     else:
         logger.info(f"Data file '{current_date_filename}' does not exist. Fetching data from Google Sheets and then creating Grist records.")
-        if not run_script('BankSync.py'):
+        if not run_step('BankSync.py'):
             logger.error("BankSync.py failed. Exiting wrapper script.")
             return 1
         
@@ -82,14 +154,17 @@ def main():
         if not os.path.exists(file_path):
             logger.error(f"BankSync.py did not create the expected file: {file_path}. Exiting wrapper script.")
             return 1
-        
-        if not run_script('createGristRecords.py'):
+
+        preflight_thread = _start_upload_preflight()
+        if not run_step('createGristRecords.py', file_path):
             logger.error("createGristRecords.py failed. Exiting wrapper script.")
             return 1
     
     # After createGristRecords.py, run uploadToGrist.py
+    if preflight_thread is not None:
+        preflight_thread.join()
     logger.info("createGristRecords.py completed. Now running uploadToGrist.py...")
-    if not run_script('uploadToGrist.py'):
+    if not run_step('uploadToGrist.py'):
         logger.error("uploadToGrist.py failed. Exiting wrapper script.")
         return 1
 
@@ -1,4 +1,6 @@
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 import json
 import os
 from dotenv import load_dotenv
@@ -28,6 +30,12 @@ def test_grist_connection():
         "Authorization": f"Bearer {GRIST_API_KEY}",
         "Content-Type": "application/json"
     }
+
+    # One pooled session for all four probes: the TCP connection is reused
+    # instead of being re-established per request
+    session = requests.Session()
+    session.headers.update(headers)
+    session.mount(f"{GRIST_BASE_HOST.split('://')[0]}://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
     
     print("Testing Self-hosted Grist API connection...")
     print(f"Grist Server: {GRIST_BASE_HOST}")
@@ -35,11 +43,26 @@ def test_grist_connection():
     print(f"Table Name: {GRIST_TABLE_NAME}")
     print(f"API Key: {GRIST_API_KEY[:10]}..." if GRIST_API_KEY else "No API key provided")
     print("-" * 50)
+
+    # The four probes are independent read-only GETs, so fire them all at
+    # once and consume the responses in the original order below. Wall time
+    # drops from four round trips to roughly one.
+    executor = ThreadPoolExecutor(max_workers=4)
+    probe_urls = [
+        f"{base_url}",
+        f"{base_url}/tables",
+        f"{base_url}/tables/{GRIST_TABLE_NAME}/columns",
+        f"{base_url}/tables/{GRIST_TABLE_NAME}/records?limit=1",
+    ]
+    doc_future, tables_future, columns_future, records_future = [
+        executor.submit(session.get, url) for url in probe_urls
+    ]
+    executor.shutdown(wait=False)
     
     # Test 1: Check if document exists
     print("Test 1: Checking document access...")
     try:
-        response = requests.get(f"{base_url}", headers=headers)
+        response = doc_future.result()
         if response.status_code == 200:
             print("✓ Document access successful")
             doc_info = response.json()
@@ -55,7 +78,7 @@ def test_grist_connection():
     # Test 2: List all tables
     print("\nTest 2: Listing all tables...")
     try:
-        response = requests.get(f"{base_url}/tables", headers=headers)
+        response = tables_future.result()
         if response.status_code == 200:
             tables = response.json()
             print("✓ Tables retrieved successfully")
@@ -79,7 +102,7 @@ def test_grist_connection():
     # Test 3: Check table structure
     print(f"\nTest 3: Checking table '{GRIST_TABLE_NAME}' structure...")
     try:
-        response = requests.get(f"{base_url}/tables/{GRIST_TABLE_NAME}/columns", headers=headers)
+        response = columns_future.result()
         if response.status_code == 200:
             columns = response.json()
             print("✓ Table structure retrieved successfully")
@@ -104,7 +127,7 @@ def test_grist_connection():
     # Test 4: Try to read records
     print(f"\nTest 4: Reading records from '{GRIST_TABLE_NAME}'...")
     try:
-        response = requests.get(f"{base_url}/tables/{GRIST_TABLE_NAME}/records?limit=1", headers=headers)
+        response = records_future.result()
         if response.status_code == 200:
             records = response.json()
             record_count = len(records.get('records', []))
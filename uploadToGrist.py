@@ -1,10 +1,17 @@
 import os
 import csv
+import functools
+import itertools
 import logging
+import re
+import time
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 import requests
-import json
-from typing import List, Dict, Any, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
+from typing import Iterable, Iterator, List, Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -34,7 +41,65 @@ if not logger.handlers:
     console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
     logger.addHandler(console_handler)
 
+# Results of preflight(), reused by main() so the probes are not repeated
+_preflight_cache: Dict[str, Any] = {}
+
+# Module-level format tables so the cached parser below stays free of
+# per-instance state
+_MM_DD_YYYY_FORMATS = (
+    '%m-%d-%Y %I:%M:%S %p', '%m-%d-%Y %H:%M:%S', '%m-%d-%Y',
+    '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %I:%M:%S %p', '%m/%d/%Y'
+)
+_DD_MM_YYYY_FORMATS = (
+    '%d-%m-%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S',
+    '%d-%m-%Y %I:%M:%S %p', '%d-%m-%Y %I:%M %p',
+    '%d-%m-%Y', '%d/%m/%Y',
+    '%d/%m/%y' # Added for DD/MM/YY format like 11/7/25
+)
+_YYYY_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+
+# Strip currency symbols, separators and stray whitespace in one pass
+_AMOUNT_STRIP = str.maketrans('', '', '$,₹ \t\n')
+
+# Uppercase a trailing am/pm marker in one scan; the word boundaries keep
+# words that merely contain "am" or "pm" untouched
+_FIX_MERIDIEM = re.compile(r'\b([ap])m\b', re.IGNORECASE)
+
+@functools.lru_cache(maxsize=4096)
+def _parse_date_string_cached(cleaned_date_string: str, bank_name: Optional[str]) -> Optional[datetime]:
+    """
+    Parse a cleaned date string to a datetime object, memoized.
+
+    Statement CSVs repeat the same handful of distinct date strings across
+    thousands of rows, so caching on (string, bank) turns the strptime
+    format cascade into a dict hit for all but the first occurrence. Must
+    stay side-effect free: results are shared across calls.
+    """
+    if bank_name == 'ICICI':
+        format_priority = _MM_DD_YYYY_FORMATS + _DD_MM_YYYY_FORMATS
+    else:
+        format_priority = _DD_MM_YYYY_FORMATS + _MM_DD_YYYY_FORMATS
+
+    for fmt in format_priority + _YYYY_FORMATS:
+        try:
+            return datetime.strptime(cleaned_date_string, fmt)
+        except ValueError:
+            continue
+
+    return None
+
 class GristCSVUploader:
+    # Mapping from Google Sheets field names to Grist field names; shared
+    # by all instances, so it is built once at class creation
+    GOOGLE_TO_GRIST_MAP = {
+        'Transaction Date': 'Transaction_Date',
+        'Transaction Description': 'Transaction_Description',
+        'Transaction Amount': 'Transaction_Amount',
+        'Reference No.': 'Reference_No',
+        'Value Date': 'Value_Date',
+        'GSheets_RowNum': 'GSheets_RowNum'
+    }
+
     def __init__(self, csv_file_path: str):
         self.csv_file_path = csv_file_path
         
@@ -45,6 +110,12 @@ class GristCSVUploader:
         self.grist_base_host = os.getenv('GRIST_BASE_HOST', 'http://safcost.duckdns.org:8484')
         self.archive_dir = os.getenv('ARCHIVE_DIR', 'archive')
         self.upload_grist_dir = os.getenv('UPLOAD_GRIST_DIR', 'UploadGrist') # Ensure this is defined
+        self.chunk_size = int(os.getenv('GRIST_CHUNK_SIZE', 500))
+        # On-disk schema cache: 0 disables it
+        self.schema_cache_ttl = int(os.getenv('GRIST_SCHEMA_CACHE_TTL', 3600))
+        self.schema_cache_path = os.path.join(
+            '.cache', 'grist_schema', f"{self.grist_doc_id}_{self.grist_table_name}.json"
+        )
 
         # Validate required environment variables
         required_vars = {
@@ -73,13 +144,27 @@ class GristCSVUploader:
             "Content-Type": "application/json"
         }
 
+        # One pooled session for every Grist call: keep-alive skips the
+        # TCP handshake on each request after the first, and transient
+        # gateway errors are retried with backoff
+        self.session = requests.Session()
+        self.session.headers.update(self.grist_headers)
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=4,
+            max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
     def _parse_unix_timestamp(self, timestamp_str: str) -> Optional[datetime]:
         """Parse Unix timestamp string to datetime object"""
         try:
             timestamp = int(timestamp_str)
             if 0 <= timestamp <= 4102444800: # Roughly 1970 to 2100
                 parsed_dt = datetime.fromtimestamp(timestamp)
-                logger.debug(f"Successfully converted Unix timestamp {timestamp} to datetime: {parsed_dt.strftime('%d/%m/%Y %H:%M:%S')}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Successfully converted Unix timestamp %s to datetime: %s", timestamp, parsed_dt.strftime('%d/%m/%Y %H:%M:%S'))
                 return parsed_dt
             else:
                 logger.warning(f"Unix timestamp {timestamp} is outside reasonable range (1970-2100)")
@@ -92,56 +177,31 @@ class GristCSVUploader:
         """Parse various date string formats to datetime object"""
         if not date_string:
             return None
-        
+
         cleaned_date_string = str(date_string).strip()
-        
+
         if cleaned_date_string.isdigit():
             return self._parse_unix_timestamp(cleaned_date_string)
 
-        if 'am' in cleaned_date_string.lower():
-            cleaned_date_string = cleaned_date_string.replace('am', 'AM').replace('AM', 'AM')
-        if 'pm' in cleaned_date_string.lower():
-            cleaned_date_string = cleaned_date_string.replace('pm', 'PM').replace('PM', 'PM')
-
-        mm_dd_yyyy_formats = [
-            '%m-%d-%Y %I:%M:%S %p', '%m-%d-%Y %H:%M:%S', '%m-%d-%Y',
-            '%m/%d/%Y %H:%M:%S', '%m/%d/%Y %I:%M:%S %p', '%m/%d/%Y'
-        ]
-        dd_mm_yyyy_formats = [
-            '%d-%m-%Y %H:%M:%S', '%d/%m/%Y %H:%M:%S', 
-            '%d-%m-%Y %I:%M:%S %p', '%d-%m-%Y %I:%M %p',
-            '%d-%m-%Y', '%d/%m/%Y',
-            '%d/%m/%y' # Added for DD/MM/YY format like 11/7/25
-        ]
-        yyyy_formats = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d']
-
-        parsed_dt = None
-
-        if bank_name and bank_name.upper() == 'ICICI':
-            format_priority = mm_dd_yyyy_formats + dd_mm_yyyy_formats
-        else:
-            format_priority = dd_mm_yyyy_formats + mm_dd_yyyy_formats
+        # Fast path for the ISO formats this pipeline itself emits
+        # ('%Y-%m-%d %H:%M:%S' / '%Y-%m-%d'): fromisoformat is
+        # C-implemented and roughly an order of magnitude faster than
+        # running the strptime cascade
+        try:
+            return datetime.fromisoformat(cleaned_date_string)
+        except ValueError:
+            pass
 
-        for fmt in format_priority:
-            try:
-                parsed_dt = datetime.strptime(cleaned_date_string, fmt)
-                logger.debug(f"Successfully parsed '{cleaned_date_string}' using format '{fmt}'")
-                break
-            except ValueError:
-                continue
+        cleaned_date_string = _FIX_MERIDIEM.sub(lambda m: m.group(1).upper() + 'M', cleaned_date_string)
 
-        if not parsed_dt:
-            for fmt in yyyy_formats:
-                try:
-                    parsed_dt = datetime.strptime(cleaned_date_string, fmt)
-                    logger.debug(f"Successfully parsed '{cleaned_date_string}' using format '{fmt}'")
-                    break
-                except ValueError:
-                    continue
+        parsed_dt = _parse_date_string_cached(
+            cleaned_date_string,
+            bank_name.upper() if bank_name else None
+        )
 
         if not parsed_dt:
             logger.warning(f"Could not parse date string: {date_string}")
-        
+
         return parsed_dt
     
     def normalize_date(self, date_value: Any, bank_name: Optional[str] = None) -> Optional[datetime]:
@@ -154,14 +214,13 @@ class GristCSVUploader:
                 return date_value
             elif isinstance(date_value, (int, float)):
                 parsed_dt = self._parse_unix_timestamp(str(int(date_value)))
-                if parsed_dt:
-                    logger.debug(f"Converted numeric timestamp {date_value} to datetime: {parsed_dt.strftime('%d/%m/%Y %H:%M:%S')}")
+                if parsed_dt and logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Converted numeric timestamp %s to datetime: %s", date_value, parsed_dt.strftime('%d/%m/%Y %H:%M:%S'))
                 return parsed_dt
             elif isinstance(date_value, str):
-                logger.debug(f"Parsing date string: '{date_value}' for bank: {bank_name}")
                 parsed_dt = self._parse_date_string(date_value, bank_name)
-                if parsed_dt:
-                    logger.debug(f"Converted date string '{date_value}' to datetime: {parsed_dt.strftime('%d/%m/%Y %H:%M:%S')}")
+                if parsed_dt and logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Converted date string '%s' to datetime: %s", date_value, parsed_dt.strftime('%d/%m/%Y %H:%M:%S'))
                 return parsed_dt
             else:
                 logger.warning(f"Unsupported date value type: {type(date_value)} - {date_value}")
@@ -178,7 +237,8 @@ class GristCSVUploader:
         
         try:
             if isinstance(amount_value, str):
-                amount_str = amount_value.replace('$', '').replace(',', '').replace('₹', '').strip()
+                # Single-pass cleanup instead of chained replace calls
+                amount_str = amount_value.translate(_AMOUNT_STRIP)
                 if not amount_str:
                     return None
                 return float(amount_str)
@@ -207,18 +267,55 @@ class GristCSVUploader:
             logger.warning(f"Failed to normalize integer {int_value}: {e}")
             return None
 
+    def _load_schema_cache(self) -> Dict[str, Any]:
+        """Return the cached table structure if it is still fresh, else {}."""
+        if self.schema_cache_ttl <= 0:
+            return {}
+        try:
+            if time.time() - os.path.getmtime(self.schema_cache_path) < self.schema_cache_ttl:
+                with open(self.schema_cache_path, 'rb') as f:
+                    structure = orjson.loads(f.read())
+                logger.debug("Using cached Grist table structure from %s", self.schema_cache_path)
+                return structure
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _save_schema_cache(self, structure: Dict[str, Any]):
+        """Persist the table structure so later runs skip the columns probe."""
+        if self.schema_cache_ttl <= 0:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.schema_cache_path), exist_ok=True)
+            with open(self.schema_cache_path, 'wb') as f:
+                f.write(orjson.dumps(structure))
+        except OSError as e:
+            logger.warning(f"Failed to write schema cache {self.schema_cache_path}: {e}")
+
+    def _invalidate_schema_cache(self):
+        """Drop the on-disk schema cache, e.g. after a rejected insert."""
+        try:
+            os.unlink(self.schema_cache_path)
+        except OSError:
+            pass
+
     def get_grist_table_structure(self) -> Dict[str, Any]:
         """Get Grist table structure to understand expected field types"""
+        # The schema changes rarely; a short-TTL disk cache keyed by doc and
+        # table saves the columns round trip on cron-driven repeat runs
+        structure = self._load_schema_cache()
+        if structure:
+            return structure
+
         try:
-            response = requests.get(
-                f"{self.grist_base_host}/api/docs/{self.grist_doc_id}/tables/{self.grist_table_name}/columns",
-                headers=self.grist_headers
+            response = self.session.get(
+                f"{self.grist_base_host}/api/docs/{self.grist_doc_id}/tables/{self.grist_table_name}/columns"
             )
             response.raise_for_status()
-            
+
             data = response.json()
             columns = data.get('columns', [])
-            
+
             logger.debug("=== GRIST TABLE STRUCTURE ===")
             structure = {}
             for col in columns:
@@ -230,119 +327,184 @@ class GristCSVUploader:
                     'label': col_label
                 }
                 logger.debug(f"Column: {col_id} ('{col_label}') - Type: {col_type}")
-            
+
+            if structure:
+                self._save_schema_cache(structure)
             return structure
-            
+
         except Exception as e:
             logger.error(f"Failed to get Grist table structure: {e}")
             return {}
 
-    def prepare_grist_record(self, sheet_record: Dict[str, Any], grist_structure: Dict[str, Any]) -> Dict[str, Any]:
+    def _build_field_map(self, grist_structure: Dict[str, Any]) -> Dict[str, Tuple[str, str]]:
+        """
+        Resolve sheet field names to (grist_field, grist_type) pairs once.
+
+        prepare_grist_record used to rebuild the sheet-to-Grist mapping and
+        scan the structure's labels for every row; building this flat table
+        once per upload turns each field resolution into a single dict hit.
+        """
+        field_map: Dict[str, Tuple[str, str]] = {}
+
+        # Column ids and labels, so records keyed either way resolve
+        for grist_col_id, grist_col_info in grist_structure.items():
+            grist_type = grist_col_info['type']
+            field_map.setdefault(grist_col_id, (grist_col_id, grist_type))
+            label = grist_col_info.get('label')
+            if label:
+                field_map.setdefault(label, (grist_col_id, grist_type))
+
+        # The explicit sheet-name mapping takes precedence over label scans
+        for sheet_field, grist_field in self.GOOGLE_TO_GRIST_MAP.items():
+            if grist_field in grist_structure:
+                field_map[sheet_field] = (grist_field, grist_structure[grist_field]['type'])
+            else:
+                logger.warning(f"Mapped Grist field '{grist_field}' for Google Sheets field '{sheet_field}' not found in Grist structure")
+                field_map.pop(sheet_field, None)
+
+        return field_map
+
+    def prepare_grist_record(self, sheet_record: Dict[str, Any], grist_structure: Dict[str, Any],
+                             field_map: Optional[Dict[str, Tuple[str, str]]] = None) -> Dict[str, Any]:
         """Prepare a record for Grist based on the table structure"""
         normalized_record = {}
-        
-        # Define the mapping from Google Sheets field names to Grist field names
-        google_to_grist_map = {
-            'Transaction Date': 'Transaction_Date',
-            'Transaction Description': 'Transaction_Description',
-            'Transaction Amount': 'Transaction_Amount',
-            'Reference No.': 'Reference_No',
-            'Value Date': 'Value_Date',
-            'GSheets_RowNum': 'GSheets_RowNum'
-        }
+
+        if field_map is None:
+            field_map = self._build_field_map(grist_structure)
 
         bank_name = sheet_record.get('Bank')
-        logger.info(f"--- prepare_grist_record ---")
-        logger.info(f"Processing record for Bank: {bank_name}")
-        logger.info(f"Original sheet_record: {sheet_record}")
+        # Per-row logging is DEBUG only; at INFO level the isEnabledFor
+        # check keeps the record dict from being rendered for every row
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        if debug_enabled:
+            logger.debug("Processing record for Bank: %s; sheet_record: %s", bank_name, sheet_record)
+
+        # Bind the hot lookups once per record instead of once per field
+        get_mapped = field_map.get
+        normalize_date = self.normalize_date
+        normalize_amount = self.normalize_amount
+        normalize_integer = self.normalize_integer
 
         for field_name, field_value in sheet_record.items():
-            if field_value is None or field_value == '':
+            # Single truthiness test instead of two comparisons; the extra
+            # clause keeps legitimate zero amounts
+            if not field_value and field_value != 0:
                 continue
-                
-            grist_field = None
-            if field_name in google_to_grist_map:
-                grist_field = google_to_grist_map[field_name]
-            else:
-                for grist_col_id, grist_col_info in grist_structure.items():
-                    if grist_col_info['label'] == field_name or grist_col_id == field_name:
-                        grist_field = grist_col_id
-                        break
-            
-            if not grist_field:
+
+            mapped = get_mapped(field_name)
+            if mapped is None:
                 logger.warning(f"Field '{field_name}' not found in Grist structure or explicit mapping, skipping")
                 continue
-            
-            if grist_field not in grist_structure:
-                logger.warning(f"Mapped Grist field '{grist_field}' for Google Sheets field '{field_name}' not found in Grist structure, skipping")
-                continue
 
-            grist_type = grist_structure[grist_field]['type']
-            logger.debug(f"Field '{field_name}' -> Grist field '{grist_field}' (type: {grist_type})")
-            
+            grist_field, grist_type = mapped
+            if debug_enabled:
+                logger.debug("Field '%s' -> Grist field '%s' (type: %s)", field_name, grist_field, grist_type)
+
             normalized_value = None
             if grist_type == 'Date' or field_name in ['Transaction Date', 'Value Date']:
-                dt_obj = self.normalize_date(field_value, bank_name)
+                dt_obj = normalize_date(field_value, bank_name)
                 if dt_obj:
+                    # isoformat skips strftime's format parsing and yields
+                    # the exact same strings
                     if grist_field == 'Value_Date': # Specific handling for Value_Date as per user feedback
-                        normalized_value = dt_obj.strftime('%Y-%m-%d') # Format as YYYY-MM-DD
+                        normalized_value = dt_obj.date().isoformat() # Format as YYYY-MM-DD
                     else:
-                        normalized_value = dt_obj.strftime('%Y-%m-%d %H:%M:%S') # Default for other date/datetime fields
-                logger.info(f"Date field '{field_name}': {field_value} -> {normalized_value} (Bank: {bank_name})")
+                        normalized_value = dt_obj.isoformat(sep=' ', timespec='seconds') # Default for other date/datetime fields
+                if debug_enabled:
+                    logger.debug("Date field '%s': %s -> %s (Bank: %s)", field_name, field_value, normalized_value, bank_name)
             elif grist_type == 'Numeric':
-                normalized_value = self.normalize_amount(field_value)
+                normalized_value = normalize_amount(field_value)
             elif grist_type == 'Int' or field_name == 'GSheets_RowNum':
-                normalized_value = self.normalize_integer(field_value)
-                logger.info(f"Integer field '{field_name}': {field_value} -> {normalized_value}")
+                normalized_value = normalize_integer(field_value)
+                if debug_enabled:
+                    logger.debug("Integer field '%s': %s -> %s", field_name, field_value, normalized_value)
             else:
-                normalized_value = str(field_value) if field_value else None
-            
+                # CSV rows already hold strings; only convert other types
+                if isinstance(field_value, str):
+                    normalized_value = field_value
+                else:
+                    normalized_value = str(field_value) if field_value else None
+
             if normalized_value is not None:
                 normalized_record[grist_field] = normalized_value
-        
-        logger.info(f"Final normalized record: {normalized_record}")
+
+        if debug_enabled:
+            logger.debug("Final normalized record: %s", normalized_record)
         return normalized_record
     
-    def create_grist_records_bulk(self, records_data: List[Dict[str, Any]]) -> bool:
-        """Create multiple new records in Grist with enhanced error handling"""
-        if not records_data:
-            logger.info("No records to insert in bulk.")
-            return True
-
+    def _post_record_chunk(self, chunk_parts: List[bytes]) -> bool:
+        """POST one serialized chunk of records to Grist."""
         try:
-            payload = {
-                "records": [
-                    {"fields": record} for record in records_data
-                ]
-            }
-            
-            logger.debug(f"Sending bulk payload to Grist: {json.dumps(payload, indent=2)}")
-            
-            response = requests.post(
+            payload_body = b'{"records":[' + b','.join(chunk_parts) + b']}'
+
+            logger.debug(f"Sending chunk of {len(chunk_parts)} records to Grist")
+
+            response = self.session.post(
                 f"{self.grist_base_url}/records",
-                headers=self.grist_headers,
-                json=payload
+                data=payload_body
             )
-            
+
             if response.status_code != 200:
+                # A rejected insert may mean the cached schema is stale
+                self._invalidate_schema_cache()
                 logger.error(f"Grist API error during bulk insert: {response.status_code}")
                 logger.error(f"Response headers: {response.headers}")
                 logger.error(f"Response content: {response.text}")
                 try:
-                    error_data = response.json()
-                    logger.error(f"Error details: {json.dumps(error_data, indent=2)}")
+                    error_data = orjson.loads(response.content)
+                    logger.error(f"Error details: {orjson.dumps(error_data, option=orjson.OPT_INDENT_2).decode()}")
                 except:
                     pass
                 return False
-            
+
             response.raise_for_status()
-            
-            logger.info(f"Successfully created {len(records_data)} records in Grist via bulk insert.")
             return True
-            
+
         except Exception as e:
             logger.error(f"Failed to create Grist records in bulk: {e}")
             return False
+
+    def create_grist_records_bulk(self, records_data: Iterable[Dict[str, Any]]) -> bool:
+        """
+        Create multiple new records in Grist with enhanced error handling.
+
+        The records are posted in chunks so a single huge CSV neither
+        produces one oversized request body nor loses everything when one
+        request fails; the chunks go out in parallel over the pooled
+        session since the requests are pure I/O waits.
+        """
+        # Serialize each record as it streams off the iterable; the raw
+        # CSV rows and the prepared dicts never coexist as full lists
+        chunks: List[List[bytes]] = []
+        records_iter = iter(records_data)
+        while True:
+            chunk_parts = [
+                orjson.dumps({"fields": record})
+                for record in itertools.islice(records_iter, self.chunk_size)
+            ]
+            if not chunk_parts:
+                break
+            chunks.append(chunk_parts)
+
+        if not chunks:
+            logger.info("No records to insert in bulk.")
+            return True
+
+        if len(chunks) == 1:
+            results = [self._post_record_chunk(chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(4, len(chunks))) as executor:
+                results = list(executor.map(self._post_record_chunk, chunks))
+
+        created_count = sum(len(chunk) for chunk, ok in zip(chunks, results) if ok)
+        total_count = sum(len(chunk) for chunk in chunks)
+
+        if all(results):
+            logger.info(f"Successfully created {created_count} records in Grist via bulk insert.")
+            return True
+
+        logger.error(f"Bulk insert partially failed: {created_count} of {total_count} records created.")
+        return False
     
     def test_grist_connection(self):
         """Test the Grist connection with enhanced debugging"""
@@ -352,16 +514,14 @@ class GristCSVUploader:
             logger.debug(f"Document ID: {self.grist_doc_id}")
             logger.debug(f"Table name: {self.grist_table_name}")
             
-            response = requests.get(
-                f"{self.grist_base_host}/api/docs/{self.grist_doc_id}",
-                headers=self.grist_headers
+            response = self.session.get(
+                f"{self.grist_base_host}/api/docs/{self.grist_doc_id}"
             )
             
             if response.status_code == 200:
                 logger.debug("✓ Grist connection successful")
-                table_response = requests.get(
-                    f"{self.grist_base_url}/records?limit=1",
-                    headers=self.grist_headers
+                table_response = self.session.get(
+                    f"{self.grist_base_url}/records?limit=1"
                 )
                 
                 if table_response.status_code == 200:
@@ -381,61 +541,104 @@ class GristCSVUploader:
             logger.error(f"✗ Grist connection test failed: {e}")
             return False
 
-    def read_csv_records(self) -> list[dict]:
-        """Reads records from the specified CSV file."""
-        records = []
+    def iter_csv_records(self) -> Iterator[dict]:
+        """Yields records from the specified CSV file one row at a time."""
+        count = 0
         try:
             with open(self.csv_file_path, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
+                # csv.reader plus dict(zip(header, row)) instead of
+                # DictReader: the header tuple is hashed once up front and
+                # each row dict is assembled in C, skipping DictReader's
+                # per-row Python bookkeeping
+                reader = csv.reader(f)
+                header = tuple(next(reader, ()))
                 for row in reader:
-                    records.append(row)
-            logger.info(f"Successfully read {len(records)} records from {self.csv_file_path}")
+                    count += 1
+                    yield dict(zip(header, row))
+            logger.info(f"Successfully read {count} records from {self.csv_file_path}")
         except FileNotFoundError:
             logger.error(f"CSV file not found: {self.csv_file_path}")
             raise
         except Exception as e:
             logger.error(f"Failed to read records from CSV file {self.csv_file_path}: {e}")
             raise
-        return records
 
-    def upload_records_to_grist(self, records: list[dict]) -> bool:
+    def read_csv_records(self) -> list[dict]:
+        """Reads records from the specified CSV file into a list."""
+        return list(self.iter_csv_records())
+
+    def upload_records_to_grist(self, records: Iterable[dict]) -> bool:
         """
-        Uploads records to Grist using the GristBankUpdater's bulk insert method.
+        Uploads records to Grist using the bulk insert method.
         The CSV records need to be mapped to Grist's expected field names.
-        """
-        if not records:
-            logger.info("No records to upload to Grist.")
-            return True
 
-        logger.info(f"Preparing {len(records)} records for Grist upload.")
-        
-        grist_structure = self.get_grist_table_structure()
+        Accepts any iterable, so rows can stream straight off the CSV
+        reader through preparation and into the request body without ever
+        being held as two full lists.
+        """
+        grist_structure = _preflight_cache.get('structure') or self.get_grist_table_structure()
         if not grist_structure:
             logger.error("Failed to retrieve Grist table structure. Cannot proceed with upload.")
             return False
 
-        grist_formatted_records = []
-        for i, record in enumerate(records):
-            try:
-                if 'Bank' not in record:
-                    logger.warning(f"Record {i+1} missing 'Bank' field. Date normalization might be affected.")
-                    record['Bank'] = 'UNKNOWN'
+        # Resolve field names to Grist columns once for the whole batch
+        field_map = self._build_field_map(grist_structure)
+
+        read_count = 0
+        prepared_count = 0
+        duplicate_count = 0
+        # Raw-string fingerprints of rows already seen in this batch;
+        # duplicates skip the whole normalization pipeline
+        seen_keys = set()
+
+        def prepared_records() -> Iterator[Dict[str, Any]]:
+            nonlocal read_count, prepared_count, duplicate_count
+            # Local bindings for the per-row hot path
+            prepare = self.prepare_grist_record
+            add_seen = seen_keys.add
+            for i, record in enumerate(records):
+                read_count += 1
+                try:
+                    # Dedup on the reference number plus date and amount
+                    # before any normalization work; rows without a
+                    # reference are never treated as duplicates
+                    reference = record.get('Reference No.')
+                    if reference:
+                        key = (reference, record.get('Transaction Date'), record.get('Transaction Amount'))
+                        if key in seen_keys:
+                            duplicate_count += 1
+                            logger.debug("Skipping duplicate record %d: %s", i + 1, key)
+                            continue
+                        add_seen(key)
+
+                    if 'Bank' not in record:
+                        logger.warning(f"Record {i+1} missing 'Bank' field. Date normalization might be affected.")
+                        record['Bank'] = 'UNKNOWN'
+
+                    prepared_record = prepare(record, grist_structure, field_map)
+                    if prepared_record:
+                        prepared_count += 1
+                        yield prepared_record
+                    else:
+                        logger.warning(f"Skipping record {i+1} due to preparation issues: {record}")
+                except Exception as e:
+                    logger.error(f"Error preparing record {i+1} for Grist: {record} - {e}")
+                    continue
 
-                prepared_record = self.prepare_grist_record(record, grist_structure)
-                if prepared_record:
-                    grist_formatted_records.append(prepared_record)
-                else:
-                    logger.warning(f"Skipping record {i+1} due to preparation issues: {record}")
-            except Exception as e:
-                logger.error(f"Error preparing record {i+1} for Grist: {record} - {e}")
-                continue
+        success = self.create_grist_records_bulk(prepared_records())
 
-        if not grist_formatted_records:
+        if read_count == 0:
+            logger.info("No records to upload to Grist.")
+            return True
+        if duplicate_count:
+            logger.info(f"Skipped {duplicate_count} duplicate records within the batch.")
+        if prepared_count == 0:
+            if duplicate_count == read_count:
+                logger.info("All records in the batch were duplicates; nothing to upload.")
+                return True
             logger.warning("No records were successfully prepared for Grist upload.")
             return False
 
-        logger.info(f"Attempting to bulk insert {len(grist_formatted_records)} records into Grist.")
-        success = self.create_grist_records_bulk(grist_formatted_records)
         if success:
             logger.info("Grist bulk upload completed successfully.")
         else:
@@ -454,56 +657,77 @@ class GristCSVUploader:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         uploaded_filename = f"Uploaded-{name_without_ext}_{timestamp}{ext}"
         
-        os.makedirs(self.archive_dir, exist_ok=True)
-        
+        # __init__ already ensured the archive directory exists
         destination_path = os.path.join(self.archive_dir, uploaded_filename)
 
         try:
-            os.rename(self.csv_file_path, destination_path)
+            # os.replace is atomic and, unlike os.rename, also succeeds on
+            # Windows when the destination already exists
+            os.replace(self.csv_file_path, destination_path)
             logger.info(f"Successfully moved '{original_filename}' to '{destination_path}'")
             return True
         except Exception as e:
             logger.error(f"Failed to move and rename CSV file '{self.csv_file_path}' to '{destination_path}': {e}")
             return False
 
+def preflight() -> bool:
+    """
+    Run the Grist connection test and table-structure probe ahead of the
+    actual upload.
+
+    run_bank_sync.py calls this from a background thread while the CSV is
+    still being generated, so the network round trips overlap the CSV
+    build. The results are cached at module level and reused by main().
+    """
+    try:
+        # __init__ never touches the file, so the path can be filled in later
+        uploader = GristCSVUploader('')
+        connection_ok = uploader.test_grist_connection()
+        _preflight_cache['connection_ok'] = connection_ok
+        if connection_ok:
+            _preflight_cache['structure'] = uploader.get_grist_table_structure()
+        return connection_ok
+    except Exception as e:
+        logger.warning(f"Grist preflight failed: {e}")
+        return False
+
 def main():
     """Main function to run the Grist CSV upload process."""
     
     upload_grist_dir = os.getenv('UPLOAD_GRIST_DIR', 'UploadGrist')
     
-    csv_files = [f for f in os.listdir(upload_grist_dir) if f.endswith('.csv')]
-    if not csv_files:
+    # scandir keeps the stat result on each entry, so picking the newest
+    # CSV costs one syscall per file instead of a listdir plus a getmtime
+    with os.scandir(upload_grist_dir) as it:
+        csv_entries = [entry for entry in it if entry.name.endswith('.csv')]
+    if not csv_entries:
         logger.info(f"No CSV files found in '{upload_grist_dir}'. Nothing to upload.")
         return 0
 
-    csv_files.sort(key=lambda x: os.path.getmtime(os.path.join(upload_grist_dir, x)), reverse=True)
-    latest_csv_file_name = csv_files[0]
-    csv_file_path = os.path.join(upload_grist_dir, latest_csv_file_name)
+    latest_entry = max(csv_entries, key=lambda entry: entry.stat().st_mtime)
+    csv_file_path = latest_entry.path
 
     try:
         uploader = GristCSVUploader(csv_file_path)
         
-        if not uploader.test_grist_connection():
+        if _preflight_cache.get('connection_ok'):
+            logger.info("Reusing Grist connection check from preflight.")
+        elif not uploader.test_grist_connection():
             logger.error("Grist connection failed. Aborting upload.")
             return 1
 
-        records_to_upload = uploader.read_csv_records()
-        
-        if records_to_upload:
-            if uploader.upload_records_to_grist(records_to_upload):
-                logger.info("CSV records successfully uploaded to Grist.")
-                if uploader.archive_csv_file():
-                    logger.info("CSV file archived successfully.")
-                else:
-                    logger.error("Failed to archive CSV file.")
-                    return 1
+        # Stream rows straight off the CSV reader into the upload; an empty
+        # file counts as success and is archived just like an uploaded one
+        if uploader.upload_records_to_grist(uploader.iter_csv_records()):
+            logger.info("CSV records successfully uploaded to Grist.")
+            if uploader.archive_csv_file():
+                logger.info("CSV file archived successfully.")
             else:
-                logger.error("Failed to upload CSV records to Grist.")
+                logger.error("Failed to archive CSV file.")
                 return 1
         else:
-            logger.info(f"No records found in CSV '{csv_file_path}' to upload. Archiving it if it exists.")
-            if os.path.exists(csv_file_path):
-                uploader.archive_csv_file()
+            logger.error("Failed to upload CSV records to Grist.")
+            return 1
 
     except Exception as e:
         logger.critical(f"An unhandled error occurred during the Grist CSV upload process: {e}", exc_info=True)